@@ -1,8 +1,17 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from config.database import DatabaseConfig
 from config.cloudinary_config import configure_cloudinary
+from config.inference_config import InferenceConfig
+from config.upload_config import UploadConfig
+from services.warmup import ModelWarmup
+from models.indexes import ensure_indexes
+from services.openai_service import close_openai_client
+from services.report_jobs import report_job_queue
+from services.metrics import MetricsMiddleware
+import asyncio
 import os
 import uvicorn
 
@@ -29,6 +38,59 @@ configure_cloudinary()
 
 # Initialize database connection
 db_config = DatabaseConfig()
+inference_config = InferenceConfig()
+upload_config = UploadConfig()
+
+# Slack for multipart boundaries and form headers around the image itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+# Single-image endpoints whose body is bounded by MAX_UPLOAD_BYTES
+SINGLE_IMAGE_PATHS = ("/upload-retinal-image/", "/enhance-retinal-image")
+# Batch endpoint, bounded by MAX_BATCH_UPLOAD_ITEMS images of that size
+BATCH_IMAGE_PATH = "/upload-retinal-images"
+
+def _upload_limit(path):
+    """(largest request body, message when exceeded) for an upload path, or None."""
+    if path.startswith(SINGLE_IMAGE_PATHS):
+        return (upload_config.max_upload_bytes + MULTIPART_OVERHEAD_BYTES,
+                f"Image exceeds the {upload_config.max_upload_bytes} byte limit")
+    if path == BATCH_IMAGE_PATH:
+        return (upload_config.max_batch_items * (upload_config.max_upload_bytes + MULTIPART_OVERHEAD_BYTES),
+                f"Batch exceeds {upload_config.max_batch_items} images of "
+                f"{upload_config.max_upload_bytes} bytes")
+    return None
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    # Reject oversized uploads from the header, before the body is read.
+    # Starlette receives and spools the whole multipart body before the
+    # handler runs, so this is the only bound on what a request can send:
+    # uploads without a Content-Length (chunked transfer) are refused.
+    limit = _upload_limit(request.url.path) if request.method == "POST" else None
+    if limit is not None:
+        content_length = request.headers.get("content-length")
+        if not (content_length and content_length.isdigit()):
+            return JSONResponse(
+                status_code=411,
+                content={'detail': {
+                    'status': 'error',
+                    'message': 'Image uploads must send a Content-Length header'
+                }}
+            )
+        max_bytes, message = limit
+        if int(content_length) > max_bytes:
+            return JSONResponse(
+                status_code=413,
+                content={'detail': {
+                    'status': 'error',
+                    'message': message
+                }}
+            )
+    return await call_next(request)
+
+# Per-route request counts, latency and in-flight requests for /metrics.
+# Added last so it is the outermost middleware and also counts the requests
+# the middleware above rejects.
+app.add_middleware(MetricsMiddleware)
 
 @app.on_event("startup")
 async def startup_event():
@@ -38,20 +100,55 @@ async def startup_event():
         print(f"Failed to initialize database: {str(e)}")
         raise
 
+    # Create missing indexes for hot-path queries; a failure (e.g. duplicate
+    # patient IDs blocking a unique index) is logged and serving continues
+    await ensure_indexes(app.state.db)
+    await prediction_service.prediction_cache.attach(app.state.db)
+
+    # Background report generation; jobs left queued or running by a previous
+    # process are picked up again
+    await report_job_queue.attach(app.state.db)
+    report_job_queue.start()
+
+    # Background analysis of accepted uploads; unfinished jobs staged on this
+    # host by a previous process are resumed
+    await analysis_pipeline.attach(app.state.db)
+    analysis_pipeline.start()
+
+    # Warmup runs in the background so /health/live answers meanwhile;
+    # /health/ready stays 503 until it succeeds, retrying with backoff
+    app.state.warmup = ModelWarmup(prediction_service, inference_config)
+    if inference_config.warmup_models:
+        app.state.warmup_task = asyncio.create_task(app.state.warmup.run())
+    elif inference_config.preload_models:
+        from services.model_registry import model_registry
+        await model_registry.load_all()
+
 @app.on_event("shutdown")
 async def shutdown_event():
+    await report_job_queue.stop()
+    await analysis_pipeline.stop()
+    warmup_task = getattr(app.state, 'warmup_task', None)
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
     if hasattr(app.state, 'db'):
         await db_config.close()
+    prediction_service.executor.shutdown(wait=False)
+    await close_openai_client()
 
 # Import and include routers
 from routes.patient import patient_router
-from routes.image import image_router
+from routes.image import image_router, prediction_service, analysis_pipeline
 from routes.report import report_router
+from routes.health import health_router
+from routes.metrics import metrics_router
 
 # Include routers
 app.include_router(patient_router)
 app.include_router(image_router)
 app.include_router(report_router)
+app.include_router(health_router)
+app.include_router(metrics_router)
 
 # Add a root endpoint
 @app.get("/")
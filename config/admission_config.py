@@ -0,0 +1,16 @@
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+class AdmissionConfig:
+    def __init__(self):
+        # Inference requests (uploads, enhancement) running at once per process
+        self.max_concurrent = int(os.getenv('ADMISSION_MAX_CONCURRENT', '8'))
+        # Requests allowed to wait for a slot; beyond this they get 503 at once
+        self.max_queue = int(os.getenv('ADMISSION_MAX_QUEUE', '32'))
+        # A request still waiting after this long gets 503 instead of a late answer
+        self.queue_timeout_seconds = float(os.getenv('ADMISSION_QUEUE_TIMEOUT_SECONDS', '10'))
+        # Retry-After bounds, in seconds; the hint itself comes from recent service times
+        self.min_retry_after_seconds = int(os.getenv('ADMISSION_MIN_RETRY_AFTER_SECONDS', '1'))
+        self.max_retry_after_seconds = int(os.getenv('ADMISSION_MAX_RETRY_AFTER_SECONDS', '30'))
@@ -1,13 +1,56 @@
 from dotenv import load_dotenv
-import boto3
+from pathlib import Path
+import hashlib
+import shutil
 import os
 
 load_dotenv()
 
+class LocalS3Client:
+    """Filesystem stand-in for the subset of the S3 client the app uses.
+
+    Objects live at ``<root>/<bucket>/<key>`` and their ETag is the MD5 of the
+    file contents, matching S3 for single-part uploads.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def _object_path(self, bucket, key):
+        path = self.root / (bucket or '') / key
+        if not path.is_file():
+            raise FileNotFoundError(f"No such key: {key}")
+        return path
+
+    def head_object(self, Bucket, Key):
+        path = self._object_path(Bucket, Key)
+        md5 = hashlib.md5()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                md5.update(chunk)
+        return {
+            'ETag': f'"{md5.hexdigest()}"',
+            'ContentLength': path.stat().st_size
+        }
+
+    def get_object(self, Bucket, Key):
+        head = self.head_object(Bucket, Key)
+        head['Body'] = open(self._object_path(Bucket, Key), 'rb')
+        return head
+
+    def download_file(self, Bucket, Key, Filename):
+        shutil.copyfile(self._object_path(Bucket, Key), Filename)
+
 def configure_aws():
+    # AWS_S3_BACKEND=local serves objects from AWS_S3_LOCAL_ROOT instead of S3
+    if os.getenv('AWS_S3_BACKEND', 's3').lower() == 'local':
+        return LocalS3Client(os.getenv('AWS_S3_LOCAL_ROOT', 'model_store'))
+
+    import boto3
+
     return boto3.client(
         's3',
         aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
         aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
         region_name=os.getenv('AWS_REGION', 'us-east-1')
-    ) 
\ No newline at end of file
+    )
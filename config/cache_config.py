@@ -0,0 +1,13 @@
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+class CacheConfig:
+    def __init__(self):
+        # Read-through cache of patient documents, per worker
+        self.patient_cache_size = int(os.getenv('PATIENT_CACHE_SIZE', '1024'))
+        # Also bounds how long another worker can serve a document after an update
+        self.patient_cache_ttl_seconds = int(os.getenv('PATIENT_CACHE_TTL_SECONDS', '30'))
+        # Optional Redis shared by all workers, e.g. redis://localhost:6379/0
+        self.patient_cache_redis_url = os.getenv('PATIENT_CACHE_REDIS_URL')
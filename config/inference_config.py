@@ -0,0 +1,56 @@
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+
+def _env_bool(name, default=False):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class InferenceConfig:
+    def __init__(self):
+        # Load the CNN and GAN once at startup instead of on the first request
+        self.preload_models = _env_bool('PRELOAD_MODELS', False)
+
+        # Run synthetic batches through both models before reporting ready
+        self.warmup_models = _env_bool('WARMUP_MODELS', self.preload_models)
+        self.warmup_rounds = max(1, int(os.getenv('WARMUP_ROUNDS', '2')))
+        # A failed warmup is retried, waiting WARMUP_RETRY_SECONDS and doubling
+        # up to WARMUP_MAX_RETRY_SECONDS between attempts
+        self.warmup_retry_seconds = float(os.getenv('WARMUP_RETRY_SECONDS', '5'))
+        self.warmup_max_retry_seconds = float(os.getenv('WARMUP_MAX_RETRY_SECONDS', '300'))
+
+        # Serve a BatchNorm-folded, frozen TorchScript Generator
+        self.compile_generator = _env_bool('GAN_COMPILE', True)
+
+        # GAN_PRECISION=int8 serves a statically quantized Generator calibrated
+        # on the images in GAN_CALIBRATION_DIR
+        self.gan_precision = os.getenv('GAN_PRECISION', 'fp32').lower()
+        self.gan_calibration_dir = os.getenv('GAN_CALIBRATION_DIR')
+        self.gan_calibration_images = int(os.getenv('GAN_CALIBRATION_IMAGES', '32'))
+
+        # Runtime for the DR grading CNN: keras, tflite or onnx
+        self.cnn_backend = os.getenv('CNN_BACKEND', 'keras').lower()
+        self.cnn_threads = int(os.getenv('CNN_THREADS', '0')) or None
+
+        # Micro-batching of concurrent DR grade predictions
+        self.max_batch_size = int(os.getenv('INFERENCE_MAX_BATCH_SIZE', '8'))
+        self.max_batch_wait_ms = float(os.getenv('INFERENCE_MAX_BATCH_WAIT_MS', '10'))
+
+        # Pool that runs decoding and model forward passes off the event loop
+        self.executor_kind = os.getenv('INFERENCE_EXECUTOR', 'thread').lower()
+        self.executor_workers = int(os.getenv('INFERENCE_WORKERS', '0')) or None
+
+        # Reuse predictions for re-uploaded images (keyed by content hash)
+        self.prediction_cache_size = int(os.getenv('PREDICTION_CACHE_SIZE', '1024'))
+        self.prediction_cache_ttl_seconds = int(os.getenv('PREDICTION_CACHE_TTL_SECONDS', '86400'))
+        self.prediction_cache_mongo = _env_bool('PREDICTION_CACHE_MONGO', False)
+
+        # Full-resolution tiled GAN enhancement
+        self.enhance_tile_size = int(os.getenv('ENHANCE_TILE_SIZE', '256'))
+        self.enhance_tile_overlap = int(os.getenv('ENHANCE_TILE_OVERLAP', '32'))
+        self.enhance_memory_budget_mb = int(os.getenv('ENHANCE_MEMORY_BUDGET_MB', '512'))
@@ -0,0 +1,28 @@
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+class PipelineConfig:
+    def __init__(self):
+        # Accepted uploads wait here until the pipeline has finished with them
+        self.staging_dir = os.getenv(
+            'ANALYSIS_STAGING_DIR',
+            os.path.join(os.path.expanduser('~'), '.cache', 'drd_gan', 'staging')
+        )
+        # Workers per stage. decode and predict are CPU bound (predict should
+        # stay at or above INFERENCE_MAX_BATCH_SIZE so micro-batches fill);
+        # upload and persist wait on the network
+        self.decode_workers = int(os.getenv('ANALYSIS_DECODE_WORKERS', '4'))
+        self.predict_workers = int(os.getenv('ANALYSIS_PREDICT_WORKERS', '8'))
+        self.upload_workers = int(os.getenv('ANALYSIS_UPLOAD_WORKERS', '8'))
+        self.persist_workers = int(os.getenv('ANALYSIS_PERSIST_WORKERS', '4'))
+        # Accepted but unfinished uploads per process; beyond this uploads get 503
+        self.max_pending = int(os.getenv('ANALYSIS_MAX_PENDING', '1000'))
+        # Bounds of the Retry-After sent with that 503
+        self.min_retry_after_seconds = int(os.getenv('ANALYSIS_MIN_RETRY_AFTER_SECONDS', '1'))
+        self.max_retry_after_seconds = int(os.getenv('ANALYSIS_MAX_RETRY_AFTER_SECONDS', '60'))
+        # Unfinished jobs of a process that stops renewing its lease are resumed
+        self.lease_seconds = int(os.getenv('ANALYSIS_LEASE_SECONDS', '60'))
+        # Finished jobs are removed from Mongo after this long
+        self.retention_seconds = int(os.getenv('ANALYSIS_RETENTION_SECONDS', str(7 * 24 * 3600)))
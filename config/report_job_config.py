@@ -0,0 +1,18 @@
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+class ReportJobConfig:
+    def __init__(self):
+        # Background report generations run at once in each API worker
+        self.workers = int(os.getenv('REPORT_JOB_WORKERS', '2'))
+        # Idle workers look for queued jobs this often (local enqueues wake them at once)
+        self.poll_seconds = float(os.getenv('REPORT_JOB_POLL_SECONDS', '2'))
+        # A running job whose lease is not renewed (worker died) is picked up again
+        self.lease_seconds = int(os.getenv('REPORT_JOB_LEASE_SECONDS', '120'))
+        # Attempts per job when the OpenAI API or MongoDB fails transiently;
+        # missing or invalid patient data fails the job on the first attempt
+        self.max_attempts = int(os.getenv('REPORT_JOB_MAX_ATTEMPTS', '3'))
+        # Finished jobs are removed from Mongo after this long
+        self.retention_seconds = int(os.getenv('REPORT_JOB_RETENTION_SECONDS', str(7 * 24 * 3600)))
@@ -0,0 +1,14 @@
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+class UploadConfig:
+    def __init__(self):
+        # Largest accepted retinal image, in bytes
+        self.max_upload_bytes = int(os.getenv('MAX_UPLOAD_BYTES', str(20 * 1024 * 1024)))
+        self.chunk_bytes = int(os.getenv('UPLOAD_CHUNK_BYTES', str(1024 * 1024)))
+        # Uploads held in memory at once; peak memory is this times max_upload_bytes
+        self.max_concurrent_uploads = int(os.getenv('MAX_CONCURRENT_UPLOADS', '8'))
+        # Images accepted in one /upload-retinal-images request
+        self.max_batch_items = int(os.getenv('MAX_BATCH_UPLOAD_ITEMS', '500'))
@@ -0,0 +1,84 @@
+"""Stage timing shared by every layer: services, models and scripts record
+how long a named stage (model fetch, inference, upload, database call) takes.
+Served at /metrics together with the HTTP metrics in services/metrics.py.
+"""
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import Counter, Gauge, Histogram
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_DURATION = Histogram(
+    'dr_api_stage_duration_seconds', 'Latency of an instrumented stage (model fetch, inference, upload, database call)',
+    ['stage'], buckets=STAGE_BUCKETS
+)
+STAGE_IN_PROGRESS = Gauge(
+    'dr_api_stage_in_progress', 'Instrumented stages currently running', ['stage']
+)
+STAGE_ERRORS = Counter(
+    'dr_api_stage_errors_total', 'Instrumented stages that raised, by exception type', ['stage', 'error']
+)
+
+# Prefix for stages recorded by the current task, e.g. 'warmup.' while the
+# startup warmup runs, so synthetic traffic stays out of the production series
+_stage_prefix = ContextVar('stage_prefix', default='')
+
+
+@functools.lru_cache(maxsize=None)
+def _stage_series(stage: str):
+    # labels() takes a lock and a dict lookup; resolve each stage's series once
+    return STAGE_DURATION.labels(stage), STAGE_IN_PROGRESS.labels(stage)
+
+
+@contextmanager
+def stage_scope(prefix: str):
+    """Record the stages run inside the block, and in tasks it starts, as `prefix.stage`."""
+    token = _stage_prefix.set(f"{_stage_prefix.get()}{prefix}.")
+    try:
+        yield
+    finally:
+        _stage_prefix.reset(token)
+
+
+@contextmanager
+def track_stage(stage: str):
+    """Time the body of the block as `stage`, counting it in flight and on error."""
+    stage = _stage_prefix.get() + stage
+    duration, in_progress = _stage_series(stage)
+    in_progress.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        STAGE_ERRORS.labels(stage, type(e).__name__).inc()
+        raise
+    finally:
+        duration.observe(time.perf_counter() - start)
+        in_progress.dec()
+
+
+def timed(stage: str):
+    """Decorator form of track_stage() for functions, coroutines and async generators."""
+    def decorate(fn):
+        if inspect.isasyncgenfunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                # Covers the whole iteration, including time spent between items
+                with track_stage(stage):
+                    async for item in fn(*args, **kwargs):
+                        yield item
+        elif inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with track_stage(stage):
+                    return await fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with track_stage(stage):
+                    return fn(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -1,3 +1,6 @@
 from .generator import Generator
+from .inference import fold_batchnorm, compile_generator
+from .quantization import quantize_generator, load_calibration_batches, psnr, ssim
 
-__all__ = ['Generator'] 
\ No newline at end of file
+__all__ = ['Generator', 'fold_batchnorm', 'compile_generator', 'quantize_generator',
+           'load_calibration_batches', 'psnr', 'ssim'] 
\ No newline at end of file
@@ -48,13 +48,14 @@ class ResidualBlock(nn.Module):
         self.bn1 = nn.BatchNorm2d(channels)
         self.conv2 = nn.Conv2d(channels, channels, 3, padding=1)
         self.bn2 = nn.BatchNorm2d(channels)
+        self.relu = nn.ReLU(inplace=True)
         
     def forward(self, x):
         residual = x
         out = self.conv1(x)
         out = self.bn1(out)
-        out = nn.ReLU(inplace=True)(out)
+        out = self.relu(out)
         out = self.conv2(out)
         out = self.bn2(out)
-        out += residual
+        out = out + residual
         return out 
\ No newline at end of file
@@ -0,0 +1,83 @@
+import copy
+import math
+import os
+import torch
+import torch.nn.functional as F
+from torch.ao.quantization import get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+from PIL import Image
+
+
+def quantized_engine():
+    engines = torch.backends.quantized.supported_engines
+    for engine in ('x86', 'fbgemm', 'qnnpack'):
+        if engine in engines:
+            return engine
+    raise RuntimeError("No quantized CPU engine available in this torch build")
+
+
+def quantize_generator(generator, calibration_batches):
+    """Static post-training int8 quantization of the Generator.
+
+    `calibration_batches` are normalised NCHW tensors drawn from real
+    fundus images; their activation ranges fix the int8 scales, so they
+    should cover the kind of input served in production.
+    """
+    if not calibration_batches:
+        raise ValueError("At least one calibration batch is required")
+
+    engine = quantized_engine()
+    torch.backends.quantized.engine = engine
+    model = copy.deepcopy(generator).eval()
+    prepared = prepare_fx(
+        model,
+        get_default_qconfig_mapping(engine),
+        example_inputs=(calibration_batches[0],)
+    )
+    with torch.no_grad():
+        for batch in calibration_batches:
+            prepared(batch)
+    return convert_fx(prepared)
+
+
+def psnr(reference, candidate):
+    """Peak signal-to-noise ratio in dB for images scaled to [0, 1]."""
+    mse = F.mse_loss(candidate, reference).item()
+    return math.inf if mse == 0 else 10.0 * math.log10(1.0 / mse)
+
+
+def ssim(reference, candidate, window_size=11, sigma=1.5):
+    """Mean structural similarity of NCHW images scaled to [0, 1]."""
+    coords = torch.arange(window_size, dtype=torch.float32) - window_size // 2
+    gauss = torch.exp(-(coords ** 2) / (2 * sigma ** 2))
+    gauss = gauss / gauss.sum()
+    channels = reference.shape[1]
+    window = (gauss[:, None] * gauss[None, :]).expand(channels, 1, window_size, window_size)
+
+    def blur(x):
+        return F.conv2d(x, window, groups=channels)
+
+    c1, c2 = 0.01 ** 2, 0.03 ** 2
+    mu_x, mu_y = blur(reference), blur(candidate)
+    sigma_x = blur(reference * reference) - mu_x ** 2
+    sigma_y = blur(candidate * candidate) - mu_y ** 2
+    sigma_xy = blur(reference * candidate) - mu_x * mu_y
+    ssim_map = ((2 * mu_x * mu_y + c1) * (2 * sigma_xy + c2)) / \
+               ((mu_x ** 2 + mu_y ** 2 + c1) * (sigma_x + sigma_y + c2))
+    return ssim_map.mean().item()
+
+
+def load_calibration_batches(directory, transform, limit=32, batch_size=4):
+    """Read up to `limit` images from `directory` into normalised batches."""
+    names = sorted(
+        name for name in os.listdir(directory)
+        if name.lower().endswith(('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp'))
+    )[:limit]
+    tensors = []
+    for name in names:
+        with Image.open(os.path.join(directory, name)) as image:
+            tensors.append(transform(image.convert('RGB')))
+    return [
+        torch.stack(tensors[i:i + batch_size])
+        for i in range(0, len(tensors), batch_size)
+    ]
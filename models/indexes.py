@@ -0,0 +1,120 @@
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Indexes the hot-path queries rely on, by collection
+REQUIRED_INDEXES = {
+    'patients': [
+        IndexModel([('patient_id', ASCENDING)], name='patient_id_unique', unique=True),
+    ],
+    'reports': [
+        IndexModel([('report_id', ASCENDING)], name='report_id_unique', unique=True),
+        IndexModel(
+            [('patient_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+            name='patient_id_created_at'
+        ),
+        IndexModel([('created_at', DESCENDING), ('_id', DESCENDING)], name='created_at'),
+        IndexModel([('input_fingerprint', ASCENDING), ('created_at', DESCENDING)], name='input_fingerprint'),
+    ],
+    'report_jobs': [
+        IndexModel([('status', ASCENDING), ('created_at', ASCENDING)], name='status_created_at'),
+    ],
+    'analysis_jobs': [
+        IndexModel([('patient_id', ASCENDING), ('created_at', DESCENDING)], name='patient_id_created_at'),
+        IndexModel([('owner', ASCENDING), ('status', ASCENDING)], name='owner_status'),
+        IndexModel([('host', ASCENDING), ('status', ASCENDING), ('lease_expires_at', ASCENDING)],
+                   name='host_status_lease'),
+    ],
+}
+
+# (collection, description, filter, sort) for every query served on a request
+# path; each must be answered from an index, without a collection scan or an
+# in-memory sort
+HOT_QUERIES = [
+    ('patients', 'PatientModel.get_patient_prediction', {'patient_id': 'explain-probe'}, None),
+    ('patients', 'PatientService.get_patient_details', {'patient_id': 'explain-probe'}, None),
+    ('patients', 'PatientService.update_image_url', {'patient_id': 'explain-probe'}, None),
+    ('patients', 'PatientService.update_prediction', {'patient_id': 'explain-probe'}, None),
+    ('patients', 'PatientService.get_existing_patient_ids', {'patient_id': {'$in': ['explain-probe']}}, None),
+    ('reports', 'ReportModel.get_report', {'report_id': 'explain-probe'}, None),
+    ('reports', 'ReportModel.find_by_fingerprint',
+     {'input_fingerprint': 'explain-probe'}, [('created_at', DESCENDING)]),
+    ('reports', 'GET /reports', {}, [('created_at', DESCENDING), ('_id', DESCENDING)]),
+    ('reports', 'GET /reports?patient_id=',
+     {'patient_id': 'explain-probe'}, [('created_at', DESCENDING), ('_id', DESCENDING)]),
+    ('analysis_jobs', 'GET /analysis-status/{patient_id}',
+     {'patient_id': 'explain-probe'}, [('created_at', DESCENDING)]),
+    ('analysis_jobs', 'AnalysisPipeline lease renewal',
+     {'owner': 'explain-probe', 'status': {'$in': ['queued', 'running']}}, None),
+    ('report_jobs', 'ReportJobQueue._claim',
+     {'$or': [{'status': 'queued'}, {'status': 'running', 'lease_expires_at': {'$lt': datetime(2000, 1, 1)}}]},
+     [('created_at', ASCENDING)]),
+]
+
+
+async def ensure_indexes(db):
+    """
+    Create any missing required index. Returns {collection: error} for the
+    collections whose indexes could not be built, e.g. because existing
+    documents violate a unique constraint.
+    """
+    errors = {}
+    for collection, indexes in REQUIRED_INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except Exception as e:
+            errors[collection] = str(e)
+            print(f"Failed to create indexes on {collection}: {str(e)}")
+    return errors
+
+
+async def missing_indexes(db):
+    """Return {collection: [index name]} for required indexes that do not exist."""
+    missing = {}
+    for collection, indexes in REQUIRED_INDEXES.items():
+        existing = await db[collection].index_information()
+        existing_keys = {tuple(info['key']) for info in existing.values()}
+        absent = [
+            index.document['name'] for index in indexes
+            if tuple(index.document['key'].items()) not in existing_keys
+        ]
+        if absent:
+            missing[collection] = absent
+    return missing
+
+
+def _plan_stages(plan):
+    stages = [plan.get('stage')]
+    for child in plan.get('inputStages', []) + [plan[key] for key in ('inputStage', 'queryPlan') if key in plan]:
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+def _plan_indexes(plan):
+    names = [plan['indexName']] if 'indexName' in plan else []
+    for child in plan.get('inputStages', []) + [plan[key] for key in ('inputStage', 'queryPlan') if key in plan]:
+        names.extend(_plan_indexes(child))
+    return names
+
+
+async def explain_hot_queries(db):
+    """
+    Explain every hot-path query and report the winning plan's stages and the
+    indexes it uses. A query with a COLLSCAN stage is flagged as not indexed.
+    """
+    results = []
+    for collection, description, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        plan = explain['queryPlanner']['winningPlan']
+        stages = _plan_stages(plan)
+        results.append({
+            'collection': collection,
+            'query': description,
+            'stages': stages,
+            'indexes': _plan_indexes(plan),
+            # A sorted query must also avoid an in-memory SORT stage
+            'indexed': 'COLLSCAN' not in stages and not (sort and 'SORT' in stages)
+        })
+    return results
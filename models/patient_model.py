@@ -3,6 +3,7 @@ from datetime import datetime, date
 from pydantic import BaseModel, Field
 from config.database import DatabaseConfig
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
 
 # Patient Schema
 class Patient(BaseModel):
@@ -40,6 +41,15 @@ class Patient(BaseModel):
 
 # Database Model
 class PatientModel:
+    # Fields returned by get_patient_prediction
+    PREDICTION_FIELDS = (
+        "dr_detection_result",
+        "severity_level",
+        "prediction_confidence",
+        "detailed_predictions",
+        "updated_at"
+    )
+
     def __init__(self, db=None):
         self.db = db
         self.collection = None
@@ -80,6 +90,9 @@ class PatientModel:
             result = await self.collection.insert_one(patient_dict)
             return str(result.inserted_id)
             
+        except DuplicateKeyError:
+            # Enforced by the unique patient_id index
+            raise ValueError(f"Patient with ID {patient_data.patient_id} already exists")
         except Exception as e:
             raise Exception(f"Database error: {str(e)}")
 
@@ -94,14 +107,7 @@ class PatientModel:
         try:
             patient = await self.collection.find_one(
                 {"patient_id": patient_id},
-                {
-                    "dr_detection_result": 1,
-                    "severity_level": 1,
-                    "prediction_confidence": 1,
-                    "detailed_predictions": 1,
-                    "updated_at": 1,
-                    "_id": 0
-                }
+                {**{field: 1 for field in self.PREDICTION_FIELDS}, "_id": 0}
             )
             return patient
         except Exception as e:
@@ -1,8 +1,27 @@
 from typing import Optional
-from datetime import datetime, date
+from datetime import datetime, date, timezone
 from pydantic import BaseModel, Field
 from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId
+from bson.errors import InvalidId
 from config.database import DatabaseConfig
+from instrumentation import timed
+import base64
+import json
+
+# Long narrative sections left out of summary listings
+NARRATIVE_FIELDS = (
+    'patient_medical_assessment',
+    'dr_status_analysis',
+    'classification_details',
+    'vulnerable_areas_analysis',
+    'risk_assessment',
+    'recommendations',
+    'follow_up_plan'
+)
+
+# Newest first; _id breaks ties between reports created in the same instant
+LISTING_SORT = [('created_at', -1), ('_id', -1)]
 
 class Report(BaseModel):
     report_id: str = Field(..., min_length=1)
@@ -26,6 +45,10 @@ class Report(BaseModel):
     recommendations: str
     follow_up_plan: str
     image_url: Optional[str] = None
+    # OpenAIService.fingerprint() of the inputs the report was generated from
+    input_fingerprint: Optional[str] = None
+    # Model, token counts and latency of the completion that wrote the report
+    generation: Optional[dict] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
     class Config:
@@ -58,6 +81,7 @@ class ReportModel:
                 self.collection = self.db.reports
         return self
 
+    @timed('report_model.create')
     async def create(self, report_data: Report) -> str:
         if self.collection is None:
             await self.initialize()
@@ -78,6 +102,7 @@ class ReportModel:
         except Exception as e:
             raise Exception(f"Database error: {str(e)}")
 
+    @timed('report_model.get_report')
     async def get_report(self, report_id: str):
         if self.collection is None:
             await self.initialize()
@@ -88,6 +113,95 @@ class ReportModel:
         except Exception as e:
             raise Exception(f"Database error: {str(e)}")
 
+    @staticmethod
+    def encode_cursor(report) -> str:
+        # Opaque keyset position: the sort key of the last report on a page
+        position = json.dumps([report['created_at'], str(report['_id'])])
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str):
+        try:
+            created_at, report_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return created_at, ObjectId(report_id)
+        except (ValueError, TypeError, InvalidId):
+            raise ValueError("Invalid pagination cursor")
+
+    @staticmethod
+    def _stored_datetime(value: datetime) -> str:
+        # created_at is stored as a naive UTC ISO string, which sorts chronologically
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat()
+
+    def _listing_filter(self, patient_id=None, severity_level=None,
+                        created_from=None, created_to=None, cursor=None):
+        query = {}
+        if patient_id:
+            query['patient_id'] = patient_id
+        if severity_level:
+            query['severity_level'] = severity_level
+        if created_from or created_to:
+            query['created_at'] = {}
+            if created_from:
+                query['created_at']['$gte'] = self._stored_datetime(created_from)
+            if created_to:
+                query['created_at']['$lt'] = self._stored_datetime(created_to)
+        if cursor:
+            created_at, last_id = self.decode_cursor(cursor)
+            after = {'$or': [
+                {'created_at': {'$lt': created_at}},
+                {'created_at': created_at, '_id': {'$lt': last_id}}
+            ]}
+            query = {'$and': [query, after]} if query else after
+        return query
+
+    @timed('report_model.iter_reports')
+    async def iter_reports(self, limit: Optional[int] = None, summary: bool = False, **filters):
+        """
+        Yield reports newest first as the cursor fetches them, optionally
+        without the narrative sections. Filters: patient_id, severity_level,
+        created_from, created_to and a cursor from encode_cursor.
+        """
+        if self.collection is None:
+            await self.initialize()
+
+        projection = {field: 0 for field in NARRATIVE_FIELDS} if summary else None
+        try:
+            cursor = self.collection.find(self._listing_filter(**filters), projection).sort(LISTING_SORT)
+            if limit:
+                cursor = cursor.limit(limit)
+            async for report in cursor:
+                yield report
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Database error: {str(e)}")
+
+    @timed('report_model.list_reports')
+    async def list_reports(self, limit: int, summary: bool = False, **filters):
+        """Return one page of reports and the cursor for the next page (None on the last)."""
+        # Fetch one extra report to learn whether another page follows
+        reports = [report async for report in self.iter_reports(limit + 1, summary, **filters)]
+        next_cursor = self.encode_cursor(reports[limit - 1]) if len(reports) > limit else None
+        return reports[:limit], next_cursor
+
+    @timed('report_model.find_by_fingerprint')
+    async def find_by_fingerprint(self, fingerprint: str):
+        """Latest report generated from inputs with this fingerprint, if any."""
+        if self.collection is None:
+            await self.initialize()
+        
+        try:
+            return await self.collection.find_one(
+                {"input_fingerprint": fingerprint},
+                {"_id": 0},
+                sort=[("created_at", -1)]
+            )
+        except Exception as e:
+            raise Exception(f"Database error: {str(e)}")
+
+    @timed('report_model.get_all_reports')
     async def get_all_reports(self):
         if self.collection is None:
             await self.initialize()
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+# Create router
+health_router = APIRouter(
+    prefix="/health",
+    tags=["health"]
+)
+
+@health_router.get("/live")
+async def live():
+    # Liveness only: the process is up and the event loop is responsive
+    return {'status': 'alive'}
+
+@health_router.get("/ready")
+async def ready(request: Request):
+    warmup = getattr(request.app.state, 'warmup', None)
+    database_ready = getattr(request.app.state, 'db', None) is not None
+    models_ready = warmup is not None and warmup.ready
+
+    content = {
+        'status': 'ready' if database_ready and models_ready else 'not_ready',
+        'database': database_ready,
+        'warmup': warmup.stats() if warmup is not None else None
+    }
+    return JSONResponse(status_code=200 if content['status'] == 'ready' else 503, content=content)
@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from fastapi.responses import Response
+from services.admission import admission_controller, AdmissionRejected, BULK, INTERACTIVE
+from services.analysis_pipeline import AnalysisPipeline
 from services.image_service import ImageService
+from services.openai_service import token_usage
 from services.patient_service import PatientService
+from services.patient_cache import patient_cache
 from services.prediction_service import PredictionService
+from services.upload_pipeline import predict_and_upload
+from services.upload_ingest import UploadIngestor, UploadRejected
 from fastapi import Request
-import tempfile
-import os
-from typing import Any
+from typing import Any, List, Optional
+import asyncio
+import time
 
 # Create router
 image_router = APIRouter(
@@ -14,17 +21,74 @@ image_router = APIRouter(
 
 # Add prediction_service as a global variable
 prediction_service = PredictionService()
+upload_ingestor = UploadIngestor()
+analysis_pipeline = AnalysisPipeline(prediction_service)
 
 # Get database from app state
 async def get_db(request: Request):
     return request.app.state.db
 
+def admission_error(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=e.status_code,
+        detail={
+            'status': 'error',
+            'message': str(e),
+            'retry_after': e.retry_after
+        },
+        headers={'Retry-After': str(e.retry_after)}
+    )
+
+def upload_error(e: UploadRejected) -> HTTPException:
+    detail = {'status': 'error', 'message': str(e)}
+    headers = None
+    if e.retry_after is not None:
+        detail['retry_after'] = e.retry_after
+        headers = {'Retry-After': str(e.retry_after)}
+    return HTTPException(status_code=e.status_code, detail=detail, headers=headers)
+
+def format_prediction(prediction_result: dict) -> dict:
+    return {
+        'dr_status': prediction_result['dr_status'],
+        'severity_level': prediction_result['severity_level'],
+        'confidence': f"{prediction_result['confidence']*100:.1f}%",
+        'detailed_predictions': {
+            k: f"{v*100:.1f}%" 
+            for k, v in prediction_result['predictions'].items()
+        }
+    }
+
+def format_analysis_job(job: dict) -> dict:
+    return {
+        'job_id': job['_id'],
+        'patient_id': job['patient_id'],
+        'filename': job.get('filename'),
+        'job_status': job['status'],
+        'stage': job.get('stage'),
+        'stages': job.get('stages', {}),
+        'image_url': job.get('image_url'),
+        'prediction': format_prediction(job['prediction']) if job.get('prediction') else None,
+        'error': job.get('error'),
+        'created_at': job.get('created_at'),
+        'finished_at': job.get('finished_at')
+    }
+
 @image_router.post("/upload-retinal-image/{patient_id}", status_code=201)
 async def upload_image(
     patient_id: str, 
+    response: Response,
     file: UploadFile = File(...), 
+    job: bool = False,
     db: Any = Depends(get_db)
 ):
+    """
+    Analyze a retinal image and store the image URL and prediction on the
+    patient. With job=true the upload is accepted (202) once it is staged,
+    and analysis runs in the background pipeline; follow it at
+    /analysis-jobs/{job_id} or /analysis-status/{patient_id}. Both answer
+    503 with a Retry-After header when they are full: the inference
+    admission queue inline, the analysis pipeline with job=true.
+    """
     try:
         if not file:
             raise HTTPException(
@@ -35,46 +99,271 @@ async def upload_image(
                 }
             )
         
-        # Save uploaded file temporarily
-        temp_dir = tempfile.mkdtemp()
-        temp_path = os.path.join(temp_dir, file.filename)
+        if job:
+            async with PatientService(db) as service:
+                if patient_id not in await service.get_existing_patient_ids([patient_id]):
+                    raise HTTPException(
+                        status_code=404,
+                        detail={
+                            'status': 'error',
+                            'message': 'Patient not found'
+                        }
+                    )
+            async with upload_ingestor.ingest(file) as image:
+                analysis_job = await analysis_pipeline.submit(patient_id, image)
+            response.status_code = 202
+            return {
+                'status': 'success',
+                'message': 'Image accepted for analysis',
+                'job_id': analysis_job['_id'],
+                'job_status': analysis_job['status'],
+                'status_url': f"/analysis-jobs/{analysis_job['_id']}"
+            }
         
-        # Write file content
-        with open(temp_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        image_service = ImageService()
         
-        # Get prediction first
-        prediction_result = await prediction_service.predict_dr_grade(temp_path)
+        # Wait for an inference slot (or get 503) before reading the image,
+        # then copy the upload into a bounded buffer
+        async with admission_controller.admit(INTERACTIVE), upload_ingestor.ingest(file) as image:
+            # Predict and upload to Cloudinary at the same time, straight from memory
+            prediction_result, image_url, public_id = await predict_and_upload(
+                prediction_service, image_service, image.data, patient_id, image.filename,
+                content_hash=image.sha256
+            )
+            
+            # Update patient record with the image URL and prediction in one write
+            async with PatientService(db) as service:
+                try:
+                    await service.update_analysis(patient_id, image_url, prediction_result)
+                except Exception:
+                    # Don't leave an image behind for a record we could not update
+                    await image_service.delete_image(public_id)
+                    raise
         
-        # Upload image to Cloudinary
+        return {
+            'status': 'success',
+            'message': 'Image uploaded and analyzed successfully',
+            'image_url': image_url,
+            'prediction': format_prediction(prediction_result)
+        }
+        
+    except HTTPException:
+        raise
+    except AdmissionRejected as e:
+        raise admission_error(e)
+    except UploadRejected as e:
+        raise upload_error(e)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                'status': 'error',
+                'message': str(e)
+            }
+        )
+
+async def _analyze_batch_item(patient_id: str, file: UploadFile, image_service: ImageService):
+    async with upload_ingestor.ingest(file) as image:
+        prediction_result, image_url, public_id = await predict_and_upload(
+            prediction_service, image_service, image.data, patient_id, image.filename,
+            content_hash=image.sha256
+        )
+    return image_url, prediction_result, public_id
+
+@image_router.post("/upload-retinal-images")
+async def upload_images(
+    patient_ids: List[str] = Form(...),
+    files: List[UploadFile] = File(...),
+    db: Any = Depends(get_db)
+):
+    """
+    Analyze many (patient_id, image) pairs in one request. The i-th
+    patient_ids form field belongs to the i-th file. Concurrent items share
+    micro-batched inference and all results are saved with one bulk write.
+    """
+    try:
+        if len(patient_ids) != len(files):
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    'status': 'error',
+                    'message': 'Each file needs exactly one patient_id'
+                }
+            )
+        if len(files) > upload_ingestor.config.max_batch_items:
+            raise HTTPException(
+                status_code=413,
+                detail={
+                    'status': 'error',
+                    'message': f"At most {upload_ingestor.config.max_batch_items} images per batch"
+                }
+            )
+        
+        start = time.perf_counter()
         image_service = ImageService()
-        image_url = await image_service.upload_image(temp_path, patient_id)
+        results = [
+            {'patient_id': patient_id, 'filename': file.filename}
+            for patient_id, file in zip(patient_ids, files)
+        ]
+        
+        # Skip model work for patients that do not exist
+        async with PatientService(db) as service:
+            existing_ids = await service.get_existing_patient_ids(patient_ids)
+        
+        pending = []
+        for index, (patient_id, file) in enumerate(zip(patient_ids, files)):
+            if patient_id in existing_ids:
+                pending.append(index)
+            else:
+                results[index].update(status='error', message='Patient not found')
+        
+        # The whole batch is one admission: its items share micro-batches
+        async with admission_controller.admit(BULK):
+            outcomes = await asyncio.gather(
+                *[_analyze_batch_item(patient_ids[i], files[i], image_service) for i in pending],
+                return_exceptions=True
+            )
         
-        # Clean up temp file
-        os.remove(temp_path)
-        os.rmdir(temp_dir)
+        analyzed = []
+        for index, outcome in zip(pending, outcomes):
+            if isinstance(outcome, BaseException):
+                results[index].update(status='error', message=str(outcome))
+            else:
+                analyzed.append((index, outcome))
         
-        # Update patient record
+        # One round trip for every successful item
         async with PatientService(db) as service:
-            await service.update_image_url(patient_id, image_url)
-            await service.update_prediction(patient_id, prediction_result)
+            try:
+                write_errors = await service.bulk_update_analysis([
+                    (patient_ids[index], image_url, prediction_result)
+                    for index, (image_url, prediction_result, _) in analyzed
+                ])
+            except Exception:
+                # Don't leave images behind for records we could not update
+                await asyncio.gather(*[
+                    image_service.delete_image(public_id) for _, (_, _, public_id) in analyzed
+                ])
+                raise
         
+        for position, (index, (image_url, prediction_result, public_id)) in enumerate(analyzed):
+            if position in write_errors:
+                await image_service.delete_image(public_id)
+                results[index].update(status='error', message=write_errors[position])
+            else:
+                results[index].update(
+                    status='success',
+                    image_url=image_url,
+                    prediction=format_prediction(prediction_result)
+                )
+        
+        succeeded = sum(1 for result in results if result['status'] == 'success')
         return {
             'status': 'success',
-            'message': 'Image uploaded and analyzed successfully',
-            'image_url': image_url,
-            'prediction': {
-                'dr_status': prediction_result['dr_status'],
-                'severity_level': prediction_result['severity_level'],
-                'confidence': f"{prediction_result['confidence']*100:.1f}%",
-                'detailed_predictions': {
-                    k: f"{v*100:.1f}%" 
-                    for k, v in prediction_result['predictions'].items()
+            'summary': {
+                'total': len(results),
+                'succeeded': succeeded,
+                'failed': len(results) - succeeded,
+                'elapsed_ms': round((time.perf_counter() - start) * 1000.0, 1)
+            },
+            'results': results
+        }
+        
+    except HTTPException:
+        raise
+    except AdmissionRejected as e:
+        raise admission_error(e)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                'status': 'error',
+                'message': str(e)
+            }
+        )
+
+@image_router.post("/enhance-retinal-image")
+async def enhance_image(
+    file: UploadFile = File(...),
+    tile_size: Optional[int] = Query(None, ge=64, le=2048),
+    overlap: Optional[int] = Query(None, ge=0, le=512)
+):
+    """
+    Enhance a retinal image with the GAN at its native resolution.
+    Returns the enhanced image as PNG.
+    """
+    try:
+        effective_tile = tile_size or prediction_service.config.enhance_tile_size
+        effective_overlap = prediction_service.config.enhance_tile_overlap if overlap is None else overlap
+        if effective_overlap >= effective_tile:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    'status': 'error',
+                    'message': 'overlap must be smaller than tile_size'
                 }
+            )
+        
+        async with admission_controller.admit(BULK), upload_ingestor.ingest(file) as image:
+            enhanced = await prediction_service.enhance_image_tiled(
+                image.data, effective_tile, effective_overlap
+            )
+        
+        return Response(content=enhanced, media_type="image/png")
+        
+    except HTTPException:
+        raise
+    except AdmissionRejected as e:
+        raise admission_error(e)
+    except UploadRejected as e:
+        raise upload_error(e)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                'status': 'error',
+                'message': str(e)
             }
+        )
+
+@image_router.get("/analysis-jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    try:
+        analysis_job = await analysis_pipeline.get(job_id)
+        if analysis_job is None:
+            raise HTTPException(
+                status_code=404,
+                detail={
+                    'status': 'error',
+                    'message': 'Analysis job not found'
+                }
+            )
+        return {
+            'status': 'success',
+            'job': format_analysis_job(analysis_job)
         }
-        
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                'status': 'error',
+                'message': str(e)
+            }
+        )
+
+@image_router.get("/analysis-status/{patient_id}")
+async def get_analysis_status(patient_id: str, limit: int = Query(20, ge=1, le=100)):
+    """Most recent background analyses for a patient, newest first, with per-stage status and timings."""
+    try:
+        analysis_jobs = await analysis_pipeline.jobs_for_patient(patient_id, limit)
+        return {
+            'status': 'success',
+            'patient_id': patient_id,
+            'jobs': [format_analysis_job(analysis_job) for analysis_job in analysis_jobs]
+        }
+
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -82,4 +371,21 @@ async def upload_image(
                 'status': 'error',
                 'message': str(e)
             }
-        ) 
\ No newline at end of file
+        )
+
+@image_router.get("/model-status")
+async def model_status(request: Request):
+    warmup = getattr(request.app.state, 'warmup', None)
+    return {
+        'status': 'success',
+        'models': prediction_service.model_registry.stats(),
+        'batching': prediction_service.scheduler.stats(),
+        'executor': prediction_service.executor.stats(),
+        'uploads': upload_ingestor.stats(),
+        'admission': admission_controller.stats(),
+        'prediction_cache': prediction_service.prediction_cache.stats(),
+        'patient_cache': patient_cache.stats(),
+        'analysis_pipeline': analysis_pipeline.stats(),
+        'report_generation': token_usage.stats(),
+        'warmup': warmup.stats() if warmup is not None else None
+    }
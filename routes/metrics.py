@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+# Create router
+metrics_router = APIRouter(
+    tags=["metrics"]
+)
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Prometheus text exposition of this process's metrics
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
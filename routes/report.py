@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from services.patient_service import PatientService
-from services.openai_service import OpenAIService
-from models.report_model import Report, ReportModel
-import uuid
+from services.report_service import ReportInputError, ReportService
+from services.report_jobs import report_job_queue, SUCCEEDED
+from models.report_model import ReportModel
+import json
 from datetime import datetime
-from typing import Any
+from typing import Any, Optional
+
+REPORTS_PAGE_SIZE = 50
+MAX_REPORTS_PAGE_SIZE = 200
 
 # Create router
 report_router = APIRouter(
@@ -15,9 +20,63 @@ report_router = APIRouter(
 async def get_db(request: Request):
     return request.app.state.db
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def _stream_report_events(service: ReportService, patient_id: str, prediction_data: dict,
+                                patient_details: dict, force: bool):
+    """
+    Server-sent events: 'section' events carry report text as tokens arrive,
+    then one 'report' event with the saved report, or an 'error' event.
+    A reusable or in-flight report is sent as whole sections.
+    """
+    try:
+        async for section, content in service.stream(patient_id, prediction_data, patient_details, force):
+            if section == "report":
+                report, reused = content
+                yield _sse("report", {'status': 'success', 'reused': reused, 'report': report})
+            else:
+                yield _sse("section", {'section': section, 'text': content})
+    except Exception as e:
+        yield _sse("error", {'status': 'error', 'message': str(e)})
+
 @report_router.post("/generate-report/{patient_id}", status_code=201)
-async def generate_report(patient_id: str, db: Any = Depends(get_db)):
+async def generate_report(
+    patient_id: str,
+    response: Response,
+    stream: bool = False,
+    force: bool = False,
+    job: bool = False,
+    db: Any = Depends(get_db)
+):
+    """
+    Generate and store a report for a patient. The latest report is returned
+    (with 200) instead while the patient's prediction and details are
+    unchanged, unless force=true. With stream=true the report is sent as
+    server-sent events while the model writes it. With job=true the report
+    is generated in the background: the response (202) carries a job id to
+    poll at /report-jobs/{job_id}.
+    """
     try:
+        if job:
+            async with PatientService(db) as service:
+                if patient_id not in await service.get_existing_patient_ids([patient_id]):
+                    raise HTTPException(
+                        status_code=404,
+                        detail={
+                            'status': 'error',
+                            'message': 'Patient not found'
+                        }
+                    )
+            queued = await report_job_queue.enqueue(patient_id, force)
+            response.status_code = 202
+            return {
+                'status': 'success',
+                'job_id': queued['_id'],
+                'job_status': queued['status'],
+                'status_url': f"/report-jobs/{queued['_id']}"
+            }
+
         async with PatientService(db) as service:
             # Get patient prediction data
             prediction_data = await service.get_prediction(patient_id)
@@ -42,47 +101,35 @@ async def generate_report(patient_id: str, db: Any = Depends(get_db)):
                 }
             )
 
-        # Generate report using OpenAI
-        openai_service = OpenAIService()
-        report_content = await openai_service.generate_report(prediction_data, patient_details)
-
-        # Create report object with all patient details
-        report_data = Report(
-            report_id=str(uuid.uuid4()),
-            patient_id=patient_id,
-            patient_name=patient_details['patient_name'],
-            date_of_birth=patient_details['date_of_birth'],
-            gender=patient_details['gender'],
-            vision_problems=patient_details.get('vision_problems'),
-            visual_acuity_right=patient_details['visual_acuity_right'],
-            visual_acuity_left=patient_details['visual_acuity_left'],
-            blood_sugar_fasting=patient_details.get('blood_sugar_fasting'),
-            blood_pressure=patient_details.get('blood_pressure'),
-            dr_status=prediction_data.get('dr_detection_result', 'Unknown'),
-            severity_level=prediction_data.get('severity_level', 'Unknown'),
-            confidence=prediction_data.get('prediction_confidence', 0.0),
-            patient_medical_assessment=report_content['patient_medical_assessment'],
-            dr_status_analysis=report_content['dr_status_analysis'],
-            classification_details=report_content['classification_details'],
-            vulnerable_areas_analysis=report_content['vulnerable_areas_analysis'],
-            risk_assessment=report_content['risk_assessment'],
-            recommendations=report_content['recommendations'],
-            follow_up_plan=report_content['follow_up_plan'],
-            image_url=patient_details.get('image_url'),
-            created_at=datetime.utcnow()
-        )
+        report_service = ReportService(db)
+        if stream:
+            return StreamingResponse(
+                _stream_report_events(report_service, patient_id, prediction_data, patient_details, force),
+                media_type="text/event-stream",
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
 
-        # Save report to database
-        report_model = ReportModel(db)
-        await report_model.create(report_data)
+        # Generate (or reuse) the report and save it to the database
+        report, reused = await report_service.generate(patient_id, prediction_data, patient_details, force)
+        if reused:
+            response.status_code = 200
 
         return {
             'status': 'success',
-            'report': report_data.dict()
+            'reused': reused,
+            'report': report
         }
 
     except HTTPException:
         raise
+    except ReportInputError as e:
+        raise HTTPException(
+            status_code=422,
+            detail={
+                'status': 'error',
+                'message': str(e)
+            }
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -92,22 +139,69 @@ async def generate_report(patient_id: str, db: Any = Depends(get_db)):
             }
         )
 
+def _serialize_report(report):
+    # Convert ObjectId to string for JSON serialization
+    if '_id' in report:
+        report['_id'] = str(report['_id'])
+    return report
+
+async def _ndjson_lines(reports):
+    async for report in reports:
+        yield json.dumps(_serialize_report(report), default=str) + "\n"
+
 @report_router.get("/reports", status_code=200)
-async def get_all_reports(db: Any = Depends(get_db)):
+async def get_all_reports(
+    db: Any = Depends(get_db),
+    patient_id: Optional[str] = None,
+    severity_level: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(REPORTS_PAGE_SIZE, ge=1, le=MAX_REPORTS_PAGE_SIZE),
+    view: str = Query("full", pattern="^(full|summary)$"),
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """
+    List reports newest first. Pages are keyset-paginated: pass the returned
+    next_cursor to get the following page. view=summary leaves out the
+    narrative sections; format=ndjson streams every matching report, one JSON
+    document per line, as the database cursor yields them (limit is ignored).
+    """
+    filters = {
+        'patient_id': patient_id,
+        'severity_level': severity_level,
+        'created_from': created_from,
+        'created_to': created_to,
+        'cursor': cursor
+    }
+    summary = view == "summary"
     try:
         report_model = ReportModel(db)
-        reports = await report_model.get_all_reports()
-        
-        # Convert ObjectId to string for JSON serialization
-        for report in reports:
-            if '_id' in report:
-                report['_id'] = str(report['_id'])
-        
+        if cursor:
+            # Reject a malformed cursor before any response is started
+            report_model.decode_cursor(cursor)
+
+        if format == "ndjson":
+            return StreamingResponse(
+                _ndjson_lines(report_model.iter_reports(summary=summary, **filters)),
+                media_type="application/x-ndjson"
+            )
+
+        reports, next_cursor = await report_model.list_reports(limit, summary, **filters)
         return {
             'status': 'success',
-            'reports': reports
+            'reports': [_serialize_report(report) for report in reports],
+            'next_cursor': next_cursor
         }
-            
+
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                'status': 'error',
+                'message': str(e)
+            }
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -115,4 +209,51 @@ async def get_all_reports(db: Any = Depends(get_db)):
                 'status': 'error',
                 'message': str(e)
             }
-        ) 
\ No newline at end of file
+        )
+
+@report_router.get("/report-jobs/{job_id}", status_code=200)
+async def get_report_job(job_id: str, db: Any = Depends(get_db)):
+    try:
+        report_job = await report_job_queue.get(job_id)
+        if report_job is None:
+            raise HTTPException(
+                status_code=404,
+                detail={
+                    'status': 'error',
+                    'message': 'Report job not found'
+                }
+            )
+
+        report = None
+        if report_job['status'] == SUCCEEDED:
+            report = await ReportModel(db).get_report(report_job['report_id'])
+            if report is not None:
+                report = _serialize_report(report)
+
+        return {
+            'status': 'success',
+            'job': {
+                'job_id': report_job['_id'],
+                'patient_id': report_job['patient_id'],
+                'job_status': report_job['status'],
+                'stage': report_job.get('stage'),
+                'attempts': report_job.get('attempts', 0),
+                'error': report_job.get('error'),
+                'reused': report_job.get('reused'),
+                'created_at': report_job.get('created_at'),
+                'started_at': report_job.get('started_at'),
+                'finished_at': report_job.get('finished_at')
+            },
+            'report': report
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                'status': 'error',
+                'message': str(e)
+            }
+        )
@@ -0,0 +1,113 @@
+"""Measure event-loop responsiveness while DR grade inference is saturated.
+
+A stand-in CNN burns a fixed amount of GIL-releasing CPU per image (like the
+real Keras/TF kernels do) and a probe coroutine, standing in for a light
+endpoint such as /get-prediction, records how late it gets scheduled.
+Compares inline execution on the loop against the configured executor.
+tests/test_event_loop.py asserts the executor keeps the probe's p99 bounded.
+
+    python scripts/bench_event_loop.py --requests 64 --work-ms 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.inference_config import InferenceConfig
+from services.prediction_service import PredictionService
+
+
+class BusyModel:
+    def __init__(self, work_ms):
+        self.work_ms = work_ms
+        self.matrix = np.random.rand(256, 256).astype(np.float32)
+
+    def predict(self, batch, verbose=0):
+        deadline = time.perf_counter() + self.work_ms * len(batch) / 1000.0
+        while time.perf_counter() < deadline:
+            self.matrix @ self.matrix
+        return np.tile(np.eye(5, dtype=np.float32)[0], (len(batch), 1))
+
+
+class StubRegistry:
+    model_service = None
+
+    def __init__(self, model):
+        self.model = model
+
+    async def get_cnn_model(self):
+        return self.model
+
+
+class InlineExecutor:
+    """Baseline: run the work directly on the event loop, as before."""
+
+    is_process = False
+
+    async def run(self, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    def shutdown(self, wait=True):
+        pass
+
+
+async def probe(stop, interval=0.005):
+    lags = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - start - interval) * 1000.0)
+    return lags
+
+
+async def run_case(service, requests):
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(stop))
+    await asyncio.sleep(0.05)
+
+    image = np.zeros((224, 224, 3), dtype=np.float32)
+    start = time.perf_counter()
+    await asyncio.gather(*[service.scheduler.submit(image) for _ in range(requests)])
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    lags = sorted(await probe_task)
+    return {
+        'inference_seconds': elapsed,
+        'probe_p50_ms': statistics.median(lags),
+        'probe_p99_ms': lags[int(len(lags) * 0.99) - 1] if len(lags) > 1 else lags[0],
+        'probe_max_ms': lags[-1]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=64)
+    parser.add_argument('--work-ms', type=float, default=20.0)
+    args = parser.parse_args()
+
+    config = InferenceConfig()
+    config.executor_kind = 'thread'
+    model = BusyModel(args.work_ms)
+
+    for name in ('inline', 'executor'):
+        service = PredictionService(model_registry=StubRegistry(model), config=config)
+        if name == 'inline':
+            service.executor = InlineExecutor()
+        result = asyncio.run(run_case(service, args.requests))
+        service.executor.shutdown()
+        print(
+            f"{name:>8}: inference {result['inference_seconds']:.2f}s | "
+            f"light-request delay p50 {result['probe_p50_ms']:.1f}ms "
+            f"p99 {result['probe_p99_ms']:.1f}ms max {result['probe_max_ms']:.1f}ms"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Compare sequential vs concurrent predict + upload latency.
+
+Uses the local uploader with a simulated network delay and a stand-in
+prediction stage, so no Cloudinary account or model is needed.
+
+    python scripts/bench_upload_pipeline.py --upload-ms 400 --predict-ms 250
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.image_service import ImageService, LocalUploader
+from services.upload_pipeline import predict_and_upload
+
+
+class StubPredictionService:
+    def __init__(self, predict_ms):
+        self.predict_ms = predict_ms
+
+    async def predict_dr_grade(self, image_path, content_hash=None):
+        await asyncio.to_thread(time.sleep, self.predict_ms / 1000.0)
+        return {'dr_status': 'Negative', 'severity_level': 'No DR', 'confidence': 1.0, 'predictions': {}}
+
+
+async def sequential(prediction_service, image_service, image_path, patient_id):
+    prediction_result = await prediction_service.predict_dr_grade(image_path)
+    image_url = await image_service.upload_image(image_path, patient_id)
+    return prediction_result, image_url
+
+
+async def measure(pipeline, prediction_service, image_service, image_path, runs):
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        await pipeline(prediction_service, image_service, image_path, f"bench{i}")
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--upload-ms', type=float, default=400.0)
+    parser.add_argument('--predict-ms', type=float, default=250.0)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    image_path = os.path.join(workdir, 'fundus.jpg')
+    with open(image_path, 'wb') as f:
+        f.write(os.urandom(512 * 1024))
+
+    prediction_service = StubPredictionService(args.predict_ms)
+    image_service = ImageService(LocalUploader(workdir, args.upload_ms))
+
+    for name, pipeline in (('sequential', sequential), ('concurrent', predict_and_upload)):
+        median = asyncio.run(measure(pipeline, prediction_service, image_service, image_path, args.runs))
+        print(f"{name:>10}: median {median:.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
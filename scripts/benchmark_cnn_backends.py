@@ -0,0 +1,140 @@
+"""Parity and performance of the CNN backends against the Keras model.
+
+    python scripts/benchmark_cnn_backends.py --model-dir models_dir --images sample_fundus/
+
+--model-dir holds the artifacts named as in services/cnn_backends.CNN_MODEL_KEYS
+(convert them with scripts/convert_cnn_model.py). Each backend runs in its own
+process, so cold start (imports + load + first prediction) and peak RSS are
+measured in isolation. Exits non-zero if any backend's five-class softmax
+differs from Keras by more than --atol or disagrees on the predicted grade.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROCESS_START = time.perf_counter()
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def peak_rss_mb():
+    # ru_maxrss survives exec on Linux, so prefer this process' own high-water mark
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_worker(args):
+    import numpy as np
+    from services.cnn_backends import CNN_MODEL_KEYS, create_backend
+
+    inputs = np.load(args.inputs)
+    backend = create_backend(args.worker, os.path.join(args.model_dir, CNN_MODEL_KEYS[args.worker]))
+    backend.predict(inputs[:1])
+    cold_start = time.perf_counter() - PROCESS_START
+
+    single = []
+    for i in range(args.runs):
+        start = time.perf_counter()
+        backend.predict(inputs[i % len(inputs):i % len(inputs) + 1])
+        single.append((time.perf_counter() - start) * 1000.0)
+
+    batch = inputs[:args.batch]
+    start = time.perf_counter()
+    for _ in range(args.runs):
+        backend.predict(batch)
+    batched = (time.perf_counter() - start) * 1000.0 / (args.runs * len(batch))
+
+    np.save(args.outputs, np.concatenate([backend.predict(inputs[i:i + 1]) for i in range(len(inputs))]))
+    print(json.dumps({
+        'cold_start_s': cold_start,
+        'latency_ms': statistics.median(single),
+        'batched_ms_per_image': batched,
+        'peak_rss_mb': peak_rss_mb()
+    }))
+
+
+def prepare_inputs(args, path):
+    import numpy as np
+    from services.prediction_service import _load_cnn_input
+
+    if args.images:
+        names = sorted(os.listdir(args.images))[:args.samples]
+        inputs = np.stack([_load_cnn_input(os.path.join(args.images, name)) for name in names])
+    else:
+        inputs = np.random.RandomState(0).rand(args.samples, 224, 224, 3).astype(np.float32)
+    np.save(path, inputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model-dir', required=True)
+    parser.add_argument('--images')
+    parser.add_argument('--samples', type=int, default=16)
+    parser.add_argument('--backends', nargs='+', default=['keras', 'tflite', 'onnx'])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--batch', type=int, default=8)
+    parser.add_argument('--atol', type=float, default=1e-4)
+    parser.add_argument('--worker')
+    parser.add_argument('--inputs')
+    parser.add_argument('--outputs')
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    import numpy as np
+
+    workdir = tempfile.mkdtemp()
+    inputs_path = os.path.join(workdir, 'inputs.npy')
+    prepare_inputs(args, inputs_path)
+
+    backends = ['keras'] + [name for name in args.backends if name != 'keras']
+    results, outputs = {}, {}
+    failed = False
+    for name in backends:
+        outputs_path = os.path.join(workdir, f"{name}.npy")
+        completed = subprocess.run(
+            [sys.executable, __file__, '--worker', name, '--model-dir', args.model_dir,
+             '--inputs', inputs_path, '--outputs', outputs_path,
+             '--runs', str(args.runs), '--batch', str(args.batch)],
+            capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            # A backend that cannot run fails the check just like one that disagrees
+            print(f"{name}: failed\n{(completed.stderr.strip().splitlines() or [''])[-1]}")
+            failed = True
+            continue
+        results[name] = json.loads(completed.stdout.strip().splitlines()[-1])
+        outputs[name] = np.load(outputs_path)
+
+    if 'keras' not in outputs:
+        print("Keras reference failed; cannot check parity")
+        sys.exit(1)
+
+    reference = outputs['keras']
+    print(f"{'backend':>8} {'cold start':>11} {'latency':>9} {'batched':>9} {'peak RSS':>9} {'max diff':>9} {'grade agree':>11}")
+    for name, result in results.items():
+        diff = float(np.abs(outputs[name] - reference).max())
+        agree = float((outputs[name].argmax(axis=1) == reference.argmax(axis=1)).mean())
+        failed |= diff > args.atol or agree < 1.0
+        print(f"{name:>8} {result['cold_start_s']:>10.2f}s {result['latency_ms']:>7.2f}ms "
+              f"{result['batched_ms_per_image']:>7.2f}ms {result['peak_rss_mb']:>7.0f}MB "
+              f"{diff:>9.1e} {agree:>10.0%}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""CPU latency of the eager Generator vs the folded, frozen channels_last one.
+
+    python scripts/benchmark_generator.py --checkpoint enhanced_gan_models.pth --size 256 --batch 4
+
+Without --checkpoint the Generator keeps its random initialisation (with
+BatchNorm statistics randomised too, so folding is actually exercised).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.architecture import Generator, compile_generator
+
+
+def load_generator(checkpoint):
+    generator = Generator()
+    if checkpoint:
+        state = torch.load(checkpoint, map_location='cpu')
+        generator.load_state_dict(state['model_state_dict'])
+    else:
+        for module in generator.modules():
+            if isinstance(module, torch.nn.BatchNorm2d):
+                module.running_mean.uniform_(-0.5, 0.5)
+                module.running_var.uniform_(0.5, 2.0)
+                module.weight.data.uniform_(0.5, 1.5)
+                module.bias.data.uniform_(-0.2, 0.2)
+    return generator.eval()
+
+
+def time_model(model, inputs, runs, warmup=2):
+    with torch.no_grad():
+        for _ in range(warmup):
+            model(inputs)
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            model(inputs)
+            timings.append((time.perf_counter() - start) * 1000.0)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--checkpoint')
+    parser.add_argument('--size', type=int, default=256)
+    parser.add_argument('--batch', type=int, default=1)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--atol', type=float, default=1e-4)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    eager = load_generator(args.checkpoint)
+    start = time.perf_counter()
+    compiled = compile_generator(eager)
+    compile_seconds = time.perf_counter() - start
+
+    inputs = torch.randn(args.batch, 3, args.size, args.size)
+    with torch.no_grad():
+        max_diff = (eager(inputs) - compiled(inputs.contiguous(memory_format=torch.channels_last))).abs().max().item()
+
+    eager_ms = time_model(eager, inputs, args.runs)
+    compiled_ms = time_model(compiled, inputs.contiguous(memory_format=torch.channels_last), args.runs)
+
+    print(f"input {args.batch}x3x{args.size}x{args.size}, compile {compile_seconds:.2f}s")
+    print(f"   eager: {eager_ms:8.1f} ms")
+    print(f"compiled: {compiled_ms:8.1f} ms  ({eager_ms / compiled_ms:.2f}x)")
+    print(f"max abs diff {max_diff:.2e} ({'ok' if max_diff <= args.atol else 'FAILED'} at atol {args.atol})")
+    sys.exit(0 if max_diff <= args.atol else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Check that every hot-path MongoDB query is served from an index.
+
+    python scripts/check_indexes.py            # check MONGODB_URI / MONGODB_DATABASE
+    python scripts/check_indexes.py --create   # build missing indexes first
+
+Exits non-zero if a required index is missing or any query in
+models/indexes.py HOT_QUERIES plans a collection scan or in-memory sort.
+tests/test_indexes.py runs the same check under pytest in a scratch database.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import DatabaseConfig
+from models.indexes import ensure_indexes, explain_hot_queries, missing_indexes
+
+
+async def check(create):
+    db_config = DatabaseConfig()
+    db = await db_config.connect()
+    try:
+        if create:
+            errors = await ensure_indexes(db)
+            if errors:
+                return False
+
+        ok = True
+        for collection, names in (await missing_indexes(db)).items():
+            print(f"MISSING  {collection}: {', '.join(names)}")
+            ok = False
+
+        for result in await explain_hot_queries(db):
+            status = 'ok' if result['indexed'] else 'SCAN'
+            indexes = ', '.join(result['indexes']) or '-'
+            print(f"{status:<8} {result['collection']:<9} {result['query']:<45} "
+                  f"{' > '.join(result['stages'])}  [{indexes}]")
+            ok = ok and result['indexed']
+        return ok
+    finally:
+        await db_config.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--create', action='store_true', help='create missing indexes before checking')
+    args = parser.parse_args()
+
+    sys.exit(0 if asyncio.run(check(args.create)) else 1)
+
+
+if __name__ == '__main__':
+    main()
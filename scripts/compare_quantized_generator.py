@@ -0,0 +1,106 @@
+"""Quality, latency and size of the int8 Generator against fp32.
+
+    python scripts/compare_quantized_generator.py --checkpoint enhanced_gan_models.pth \
+        --calibration-dir data/calibration --eval-dir data/holdout --min-psnr 35 --min-ssim 0.97
+
+Exits non-zero when the mean PSNR or SSIM falls below the gate, so it can
+guard turning on GAN_PRECISION=int8. --synthetic N replaces both image
+directories with random images for a smoke run.
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.architecture import Generator, quantize_generator, load_calibration_batches, psnr, ssim
+from services.tiled_enhancement import MEAN, STD
+
+_MEAN = torch.tensor(MEAN).view(1, 3, 1, 1)
+_STD = torch.tensor(STD).view(1, 3, 1, 1)
+
+
+def to_unit_range(output):
+    return (output * _STD + _MEAN).clamp(0, 1)
+
+
+def serialized_size(model):
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+
+def median_latency(model, batch, runs=5):
+    with torch.no_grad():
+        model(batch)
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            model(batch)
+            timings.append((time.perf_counter() - start) * 1000.0)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--checkpoint')
+    parser.add_argument('--calibration-dir')
+    parser.add_argument('--eval-dir')
+    parser.add_argument('--synthetic', type=int, default=0)
+    parser.add_argument('--limit', type=int, default=32)
+    parser.add_argument('--min-psnr', type=float, default=35.0)
+    parser.add_argument('--min-ssim', type=float, default=0.97)
+    args = parser.parse_args()
+
+    from services.prediction_service import enhance_transform
+
+    generator = Generator()
+    if args.checkpoint:
+        state = torch.load(args.checkpoint, map_location='cpu')
+        generator.load_state_dict(state['model_state_dict'])
+    generator.eval()
+
+    if args.synthetic:
+        torch.manual_seed(0)
+        calibration = [torch.randn(4, 3, 256, 256) for _ in range(max(1, args.synthetic // 4))]
+        evaluation = [torch.randn(1, 3, 256, 256) for _ in range(args.synthetic)]
+    else:
+        if not args.calibration_dir or not args.eval_dir:
+            parser.error("--calibration-dir and --eval-dir are required without --synthetic")
+        calibration = load_calibration_batches(args.calibration_dir, enhance_transform(), args.limit)
+        evaluation = load_calibration_batches(args.eval_dir, enhance_transform(), args.limit, batch_size=1)
+
+    start = time.perf_counter()
+    quantized = quantize_generator(generator, calibration)
+    print(f"quantized in {time.perf_counter() - start:.1f}s on {sum(len(b) for b in calibration)} images")
+
+    psnrs, ssims = [], []
+    with torch.no_grad():
+        for batch in evaluation:
+            reference = to_unit_range(generator(batch))
+            candidate = to_unit_range(quantized(batch))
+            psnrs.append(psnr(reference, candidate))
+            ssims.append(ssim(reference, candidate))
+
+    fp32_ms = median_latency(generator, evaluation[0])
+    int8_ms = median_latency(quantized, evaluation[0])
+    fp32_size, int8_size = serialized_size(generator), serialized_size(quantized)
+    mean_psnr, mean_ssim = statistics.mean(psnrs), statistics.mean(ssims)
+
+    print(f"PSNR  mean {mean_psnr:.2f} dB  min {min(psnrs):.2f} dB")
+    print(f"SSIM  mean {mean_ssim:.4f}     min {min(ssims):.4f}")
+    print(f"latency  fp32 {fp32_ms:.1f} ms  int8 {int8_ms:.1f} ms  ({fp32_ms / int8_ms:.2f}x)")
+    print(f"weights  fp32 {fp32_size / 1e6:.1f} MB  int8 {int8_size / 1e6:.1f} MB")
+
+    passed = mean_psnr >= args.min_psnr and mean_ssim >= args.min_ssim
+    print(f"quality gate (PSNR >= {args.min_psnr}, SSIM >= {args.min_ssim}): {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Convert the Keras DR grading model for a lightweight CNN_BACKEND.
+
+    python scripts/convert_cnn_model.py DR_model_final.h5 --format tflite
+    python scripts/convert_cnn_model.py DR_model_final.h5 --format onnx
+
+Upload the result next to the .h5 in the model bucket under the key listed
+in services/cnn_backends.CNN_MODEL_KEYS, then set CNN_BACKEND on the workers.
+ONNX conversion needs the tf2onnx package.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.cnn_backends import CNN_MODEL_KEYS
+
+INPUT_SHAPE = (None, 224, 224, 3)
+
+
+def convert_tflite(model, output_path, optimize):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if optimize:
+        # Dynamic-range int8 weights; activations stay float
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    with open(output_path, 'wb') as f:
+        f.write(converter.convert())
+
+
+def convert_onnx(model, output_path, opset):
+    import tensorflow as tf
+    import tf2onnx
+
+    signature = [tf.TensorSpec(INPUT_SHAPE, tf.float32, name='input')]
+
+    # Converting a traced function works across Keras versions, unlike from_keras
+    @tf.function(input_signature=signature)
+    def serve(images):
+        return model(images, training=False)
+
+    tf2onnx.convert.from_function(serve, input_signature=signature, opset=opset, output_path=output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', help='Keras .h5 model')
+    parser.add_argument('--format', choices=['tflite', 'onnx'], required=True)
+    parser.add_argument('--output')
+    parser.add_argument('--optimize', action='store_true', help='TFLite dynamic-range quantization')
+    parser.add_argument('--opset', type=int, default=17)
+    args = parser.parse_args()
+
+    from keras._tf_keras.keras.models import load_model
+
+    output_path = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(args.input)),
+        CNN_MODEL_KEYS[args.format]
+    )
+    model = load_model(args.input)
+    if args.format == 'tflite':
+        convert_tflite(model, output_path, args.optimize)
+    else:
+        convert_onnx(model, output_path, args.opset)
+
+    print(f"Wrote {output_path} ({os.path.getsize(output_path) / 1e6:.1f} MB); "
+          f"upload it as s3://$AWS_BUCKET_NAME/{CNN_MODEL_KEYS[args.format]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Import time, peak memory and heavy frameworks pulled in by `import app`.
+
+    python scripts/measure_startup.py            # human readable
+    python scripts/measure_startup.py --json     # one JSON line, for tracking over time
+
+Each run happens in a fresh interpreter so nothing is already imported.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['torch', 'torchvision', 'tensorflow', 'keras', 'cv2', 'boto3', 'onnxruntime']
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+peak = None
+with open('/proc/self/status') as status:
+    for line in status:
+        if line.startswith('VmHWM:'):
+            peak = int(line.split()[1]) / 1024.0
+print(json.dumps({
+    'import_seconds': elapsed,
+    'peak_rss_mb': peak,
+    'heavy_modules': [name for name in %r if name in sys.modules]
+}))
+""" % (HEAVY_MODULES,)
+
+
+def import_profile(top):
+    """Packages ranked by the self import time of all their modules (-X importtime)."""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    totals = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = [part.strip() for part in line[len('import time:'):].split('|')]
+        if len(parts) != 3 or not parts[0].isdigit():
+            continue
+        package = parts[2].split('.')[0]
+        totals[package] = totals.get(package, 0) + int(parts[0])
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{'package': name, 'self_ms': micros / 1000.0} for name, micros in ranked]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    completed = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        print(completed.stderr, file=sys.stderr)
+        sys.exit(completed.returncode)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['slowest_imports'] = import_profile(args.top)
+
+    if args.json:
+        print(json.dumps(result))
+        return
+
+    print(f"import app: {result['import_seconds']:.2f}s, peak RSS {result['peak_rss_mb']:.0f} MB")
+    print(f"heavy frameworks loaded: {', '.join(result['heavy_modules']) or 'none'}")
+    print("slowest packages to import:")
+    for entry in result['slowest_imports']:
+        print(f"  {entry['self_ms']:8.1f} ms  {entry['package']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Local OpenAI-compatible chat completion server for testing report generation.
+
+    python scripts/mock_openai_server.py --port 8001 --first-token-ms 500 --token-ms 20
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=mock uvicorn app:app
+
+Answers POST /v1/chat/completions with a canned seven-section report, either
+as one response or, with "stream": true, as server-sent chunks one word at a
+time, so time-to-first-byte of /generate-report can be measured offline.
+Requests with a response_format get the report as a JSON object keyed by
+section field. Usage is reported with the prompt counted at ~4 characters
+per token.
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+SECTION_TITLES = {
+    "patient_medical_assessment": "Patient Medical Assessment",
+    "dr_status_analysis": "DR Status Analysis",
+    "classification_details": "Classification Details",
+    "vulnerable_areas_analysis": "Vulnerable Areas Analysis",
+    "risk_assessment": "Risk Assessment",
+    "recommendations": "Recommendations",
+    "follow_up_plan": "Follow-up Plan"
+}
+
+SENTENCE = (
+    "Findings are consistent with the reported grade and should be reviewed "
+    "together with the patient history and systemic risk factors."
+)
+
+
+def canned_report(sentences, structured=False):
+    text = " ".join([SENTENCE] * sentences)
+    if structured:
+        return json.dumps({field: text for field in SECTION_TITLES})
+    return "\n\n".join(f"{title}: {text}" for title in SECTION_TITLES.values())
+
+
+def prompt_tokens(messages):
+    return sum(len(message.get("content") or "") for message in messages) // 4
+
+
+def tokens(text):
+    # Word-sized pieces that keep the separators, like a tokenizer would
+    pieces, current = [], ""
+    for char in text:
+        current += char
+        if char in " \n":
+            pieces.append(current)
+            current = ""
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def create_app(first_token_ms, token_ms, sentences):
+    app = FastAPI(title="Mock OpenAI")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "mock")
+        content = canned_report(sentences, structured=bool(body.get("response_format")))
+        pieces = tokens(content)
+        prompt = prompt_tokens(body.get("messages", []))
+        usage = {"prompt_tokens": prompt, "completion_tokens": len(pieces), "total_tokens": prompt + len(pieces)}
+
+        if not body.get("stream"):
+            # The whole completion is only available once every token is generated
+            await asyncio.sleep((first_token_ms + token_ms * len(pieces)) / 1000.0)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            }
+
+        async def events():
+            await asyncio.sleep(first_token_ms / 1000.0)
+            for piece in pieces:
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(token_ms / 1000.0)
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                usage_chunk = dict(final, choices=[], usage=usage)
+                yield f"data: {json.dumps(usage_chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--first-token-ms', type=float, default=500.0, help='delay before the first token')
+    parser.add_argument('--token-ms', type=float, default=20.0, help='delay between tokens')
+    parser.add_argument('--sentences', type=int, default=6, help='sentences per report section')
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.first_token_ms, args.token_ms, args.sentences), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from config.admission_config import AdmissionConfig
+from services.metrics import ADMISSION_ACTIVE, ADMISSION_QUEUED, ADMISSION_REJECTED
+
+# Admission priorities, most urgent first. Light reads (predictions,
+# reports, job status) never pass through admission, so inference load
+# cannot queue them.
+INTERACTIVE = 0   # single image analysis a user is waiting on
+BULK = 1          # batch uploads and full-resolution enhancement
+BACKGROUND = 2    # analysis pipeline work; waits for a slot, never rejected
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BULK: 'bulk', BACKGROUND: 'background'}
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.status_code = 503
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounds the inference work a process runs at once.
+
+    At most `max_concurrent` admitted requests hold a slot. Others wait in
+    a priority queue, so a freed slot goes to the most urgent waiter, and
+    requests that find the queue full, or wait longer than
+    `queue_timeout_seconds`, are rejected with a Retry-After hint instead of
+    slowing everyone down.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or AdmissionConfig()
+        self._loop = None
+        self._waiters = []
+        self._sequence = itertools.count()
+        self.active = 0
+        self.queued = {priority: 0 for priority in PRIORITY_NAMES}
+        self.admitted = {priority: 0 for priority in PRIORITY_NAMES}
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_seconds = 0.0
+        # Moving average of how long a request holds its slot
+        self.mean_hold_seconds = None
+
+    def _check_loop(self):
+        # Waiters belong to one event loop; start afresh if the loop changed (tests)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._waiters = []
+            self.active = 0
+            self.queued = {priority: 0 for priority in PRIORITY_NAMES}
+        return loop
+
+    def retry_after(self):
+        """Seconds until the current queue has likely drained."""
+        hold = self.mean_hold_seconds or 1.0
+        waiting = sum(self.queued.values()) + 1
+        estimate = math.ceil(waiting * hold / max(1, self.config.max_concurrent))
+        return max(self.config.min_retry_after_seconds, min(self.config.max_retry_after_seconds, estimate))
+
+    def _reject(self, priority, reason):
+        self.rejected += 1
+        ADMISSION_REJECTED.labels(PRIORITY_NAMES[priority], reason).inc()
+        raise AdmissionRejected("Server is busy; retry shortly", self.retry_after())
+
+    def _wake(self):
+        while self._waiters and self.active < self.config.max_concurrent:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+
+    async def _acquire(self, priority):
+        loop = self._check_loop()
+        if self.active < self.config.max_concurrent and not self._waiters:
+            self.active += 1
+            return
+
+        if priority != BACKGROUND:
+            foreground = sum(count for p, count in self.queued.items() if p != BACKGROUND)
+            if foreground >= self.config.max_queue:
+                self._reject(priority, 'queue_full')
+
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self.queued[priority] += 1
+        started = time.perf_counter()
+        try:
+            timeout = None if priority == BACKGROUND else self.config.queue_timeout_seconds
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            self._reject(priority, 'queue_timeout')
+        except BaseException:
+            # Cancelled just after being handed a slot: pass it on
+            if future.done() and not future.cancelled():
+                self.active -= 1
+                self._wake()
+            raise
+        finally:
+            self.queued[priority] -= 1
+            self.wait_seconds += time.perf_counter() - started
+
+    def _release(self, held_seconds):
+        self.active -= 1
+        if self.mean_hold_seconds is None:
+            self.mean_hold_seconds = held_seconds
+        else:
+            self.mean_hold_seconds = 0.9 * self.mean_hold_seconds + 0.1 * held_seconds
+        self._wake()
+
+    @asynccontextmanager
+    async def admit(self, priority=INTERACTIVE):
+        """Hold an inference slot for the body of the block; raises AdmissionRejected."""
+        await self._acquire(priority)
+        self.admitted[priority] += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(time.perf_counter() - started)
+
+    def stats(self):
+        admitted = sum(self.admitted.values())
+        return {
+            'max_concurrent': self.config.max_concurrent,
+            'max_queue': self.config.max_queue,
+            'active': self.active,
+            'queued': {PRIORITY_NAMES[p]: count for p, count in self.queued.items()},
+            'admitted': {PRIORITY_NAMES[p]: count for p, count in self.admitted.items()},
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'mean_wait_ms': round(self.wait_seconds * 1000.0 / admitted, 1) if admitted else None,
+            'mean_hold_ms': round(self.mean_hold_seconds * 1000.0, 1) if self.mean_hold_seconds else None,
+            'retry_after_seconds': self.retry_after()
+        }
+
+
+admission_controller = AdmissionController()
+
+# Read at scrape time, so admission itself does no extra bookkeeping
+ADMISSION_ACTIVE.set_function(lambda: admission_controller.active)
+for _priority, _name in PRIORITY_NAMES.items():
+    ADMISSION_QUEUED.labels(_name).set_function(lambda priority=_priority: admission_controller.queued[priority])
@@ -0,0 +1,372 @@
+import asyncio
+import math
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from config.pipeline_config import PipelineConfig
+from services.admission import admission_controller, BACKGROUND
+from services.image_service import ImageService
+from services.patient_service import PatientService
+from services.upload_ingest import UploadRejected
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+DECODE = 'decode'
+PREDICT = 'predict'
+UPLOAD = 'upload'
+PERSIST = 'persist'
+STAGES = (DECODE, PREDICT, UPLOAD, PERSIST)
+
+
+class _Job:
+    def __init__(self, document):
+        self.id = document['_id']
+        self.patient_id = document['patient_id']
+        self.filename = document['filename']
+        self.sha256 = document['sha256']
+        self.staged_path = document['staged_path']
+        self.prediction = document.get('prediction')
+        self.image_url = document.get('image_url')
+        self.public_id = document.get('public_id')
+        self.array = None
+        self.enqueued_at = time.perf_counter()
+
+
+class AnalysisPipeline:
+    """Background analysis of accepted retinal uploads.
+
+    An accepted upload is written to the staging directory and recorded in
+    the `analysis_jobs` collection, then flows through decode -> predict ->
+    upload -> persist. Each stage has its own queue and worker count, so
+    CPU-bound inference is throttled separately from the network-bound
+    stages, and bounded queues between stages apply backpressure. Stage
+    status and timings are written to the job document as it moves.
+
+    Staged files are local, so unfinished jobs are resumed by a process on
+    the same host: each process renews a lease on its jobs and picks up
+    jobs whose owner stopped renewing (e.g. after a restart).
+    """
+
+    def __init__(self, prediction_service, image_service=None, config=None, admission=None):
+        self.prediction_service = prediction_service
+        self.image_service = image_service or ImageService()
+        self.config = config or PipelineConfig()
+        self.admission = admission or admission_controller
+        self.db = None
+        self.collection = None
+        self.host = socket.gethostname()
+        self.owner = f"{self.host}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.workers = {
+            DECODE: self.config.decode_workers,
+            PREDICT: self.config.predict_workers,
+            UPLOAD: self.config.upload_workers,
+            PERSIST: self.config.persist_workers
+        }
+        self.handlers = {
+            DECODE: self._decode,
+            PREDICT: self._predict,
+            UPLOAD: self._upload,
+            PERSIST: self._persist
+        }
+        self._queues = {}
+        self._tasks = []
+        self.pending = 0
+        self.accepted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.resumed = 0
+        self.stage_seconds = {stage: 0.0 for stage in STAGES}
+        self.stage_runs = {stage: 0 for stage in STAGES}
+
+    async def attach(self, db):
+        self.db = db
+        self.collection = db.analysis_jobs
+        await self.collection.create_index('expires_at', expireAfterSeconds=0)
+
+    def start(self):
+        os.makedirs(self.config.staging_dir, exist_ok=True)
+        # Accepted jobs wait unbounded (capped by max_pending) before decode;
+        # later queues hold a couple of jobs per worker so a slow stage
+        # holds back the stages feeding it
+        self._queues = {
+            stage: asyncio.Queue(maxsize=0 if stage == DECODE else 2 * max(1, self.workers[stage]))
+            for stage in STAGES
+        }
+        self._tasks = [
+            asyncio.create_task(self._stage_worker(stage))
+            for stage in STAGES
+            for _ in range(max(1, self.workers[stage]))
+        ]
+        self._tasks.append(asyncio.create_task(self._maintain_leases()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _lease(self):
+        return datetime.utcnow() + timedelta(seconds=self.config.lease_seconds)
+
+    async def submit(self, patient_id: str, image) -> dict:
+        """Stage an ingested upload and queue it for analysis; returns the job document."""
+        if self.pending >= self.config.max_pending:
+            raise UploadRejected("Analysis queue is full; retry shortly", 503, self.retry_after())
+
+        job_id = str(uuid.uuid4())
+        staged_path = os.path.join(self.config.staging_dir, f"{job_id}.{image.format}")
+        await asyncio.to_thread(self._write_staged, staged_path, image.data)
+
+        now = datetime.utcnow()
+        document = {
+            '_id': job_id,
+            'patient_id': patient_id,
+            'filename': image.filename,
+            'sha256': image.sha256,
+            'staged_path': staged_path,
+            'host': self.host,
+            'owner': self.owner,
+            'lease_expires_at': self._lease(),
+            'status': QUEUED,
+            'stage': DECODE,
+            'stages': {stage: {'status': QUEUED} for stage in STAGES},
+            'prediction': None,
+            'image_url': None,
+            'public_id': None,
+            'error': None,
+            'created_at': now,
+            'updated_at': now
+        }
+        try:
+            await self.collection.insert_one(document)
+        except Exception:
+            os.remove(staged_path)
+            raise
+
+        self.accepted += 1
+        self._enqueue(_Job(document))
+        return document
+
+    @staticmethod
+    def _write_staged(path, data):
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def _enqueue(self, job):
+        self.pending += 1
+        job.enqueued_at = time.perf_counter()
+        self._queues[DECODE].put_nowait(job)
+
+    async def get(self, job_id: str):
+        return await self.collection.find_one({'_id': job_id})
+
+    async def jobs_for_patient(self, patient_id: str, limit: int = 20):
+        cursor = self.collection.find({'patient_id': patient_id}).sort('created_at', -1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def _record(self, job, fields):
+        fields['updated_at'] = datetime.utcnow()
+        try:
+            await self.collection.update_one({'_id': job.id}, {'$set': fields})
+        except Exception as e:
+            # Tracking is best effort; the analysis itself carries on
+            print(f"Failed to record analysis job {job.id}: {str(e)}")
+
+    async def _decode(self, job):
+        if job.prediction is not None:
+            return False
+        # Re-uploads of the same image under the same model skip inference
+        cached = await self.prediction_service.cached_prediction(job.sha256)
+        if cached is not None:
+            job.prediction = cached
+            return False
+        job.array = await self.prediction_service.preprocess(job.staged_path)
+        return True
+
+    async def _predict(self, job):
+        if job.prediction is not None:
+            return False
+        # Background inference yields CPU to requests someone is waiting on
+        async with self.admission.admit(BACKGROUND):
+            job.prediction = await self.prediction_service.predict_preprocessed(job.array, job.sha256)
+        job.array = None
+        return True
+
+    async def _upload(self, job):
+        if job.image_url is not None:
+            return False
+        job.public_id = self.image_service.public_id_for(job.filename, job.patient_id)
+        job.image_url = await self.image_service.upload_image(
+            job.staged_path, job.patient_id, job.filename, job.public_id
+        )
+        return True
+
+    async def _persist(self, job):
+        async with PatientService(self.db) as service:
+            try:
+                await service.update_analysis(job.patient_id, job.image_url, job.prediction)
+            except Exception:
+                # Don't leave an image behind for a record we could not update
+                if job.public_id is not None:
+                    await self.image_service.delete_image(job.public_id)
+                job.image_url = None
+                job.public_id = None
+                raise
+        return True
+
+    async def _stage_worker(self, stage):
+        queue = self._queues[stage]
+        while True:
+            job = await queue.get()
+            try:
+                await self._run_stage(stage, job)
+            except Exception as e:
+                print(f"Analysis pipeline {stage} worker error: {str(e)}")
+            finally:
+                queue.task_done()
+
+    async def _run_stage(self, stage, job):
+        started = time.perf_counter()
+        wait_ms = round((started - job.enqueued_at) * 1000.0, 1)
+        await self._record(job, {
+            'status': RUNNING,
+            'stage': stage,
+            f'stages.{stage}.status': RUNNING,
+            f'stages.{stage}.started_at': datetime.utcnow(),
+            f'stages.{stage}.wait_ms': wait_ms
+        })
+
+        try:
+            ran = await self.handlers[stage](job)
+        except Exception as e:
+            duration_ms = round((time.perf_counter() - started) * 1000.0, 1)
+            await self._finish(job, FAILED, {
+                f'stages.{stage}.status': FAILED,
+                f'stages.{stage}.duration_ms': duration_ms,
+                f'stages.{stage}.error': str(e),
+                'image_url': job.image_url,
+                'public_id': job.public_id,
+                'error': f"{stage} failed: {str(e)}"
+            })
+            return
+
+        duration = time.perf_counter() - started
+        if ran:
+            self.stage_seconds[stage] += duration
+            self.stage_runs[stage] += 1
+        fields = {
+            f'stages.{stage}.status': SUCCEEDED if ran else SKIPPED,
+            f'stages.{stage}.duration_ms': round(duration * 1000.0, 1)
+        }
+        # Results are saved as they appear so a resumed job skips finished work
+        if stage == PREDICT or (stage == DECODE and not ran):
+            fields['prediction'] = job.prediction
+        if stage == UPLOAD:
+            fields['image_url'] = job.image_url
+            fields['public_id'] = job.public_id
+
+        index = STAGES.index(stage)
+        if index == len(STAGES) - 1:
+            await self._finish(job, SUCCEEDED, fields)
+            return
+
+        next_stage = STAGES[index + 1]
+        fields['stage'] = next_stage
+        await self._record(job, fields)
+        job.enqueued_at = time.perf_counter()
+        await self._queues[next_stage].put(job)
+
+    async def _finish(self, job, status, fields):
+        self.pending -= 1
+        if status == SUCCEEDED:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        finished_at = datetime.utcnow()
+        fields.update({
+            'status': status,
+            'stage': None,
+            'finished_at': finished_at,
+            'expires_at': finished_at + timedelta(seconds=self.config.retention_seconds),
+            'lease_expires_at': None
+        })
+        await self._record(job, fields)
+        try:
+            os.remove(job.staged_path)
+        except OSError:
+            pass
+
+    async def _resume(self, document):
+        if not os.path.exists(document['staged_path']):
+            await self._record(_Job(document), {
+                'status': FAILED,
+                'stage': None,
+                'error': 'Staged upload is missing',
+                'finished_at': datetime.utcnow(),
+                'expires_at': datetime.utcnow() + timedelta(seconds=self.config.retention_seconds),
+                'lease_expires_at': None
+            })
+            return
+        # Every stage skips work whose result is already on the document
+        self.resumed += 1
+        self._enqueue(_Job(document))
+
+    async def _maintain_leases(self):
+        while True:
+            try:
+                await self.collection.update_many(
+                    {'owner': self.owner, 'status': {'$in': [QUEUED, RUNNING]}},
+                    {'$set': {'lease_expires_at': self._lease()}}
+                )
+                # Take over unfinished jobs staged on this host by a process that is gone
+                while self.pending < self.config.max_pending:
+                    document = await self.collection.find_one_and_update(
+                        {
+                            'host': self.host,
+                            'status': {'$in': [QUEUED, RUNNING]},
+                            'lease_expires_at': {'$lt': datetime.utcnow()}
+                        },
+                        {'$set': {'owner': self.owner, 'lease_expires_at': self._lease(), 'status': QUEUED}}
+                    )
+                    if document is None:
+                        break
+                    await self._resume(document)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Analysis pipeline lease maintenance failed: {str(e)}")
+            await asyncio.sleep(self.config.lease_seconds / 3)
+
+    def retry_after(self):
+        """Seconds until the pending jobs have likely drained through the slowest stage."""
+        per_job = max(
+            (self.stage_seconds[stage] / self.stage_runs[stage] / max(1, self.workers[stage])
+             for stage in STAGES if self.stage_runs[stage]),
+            default=1.0
+        )
+        estimate = math.ceil(self.pending * per_job)
+        return max(self.config.min_retry_after_seconds, min(self.config.max_retry_after_seconds, estimate))
+
+    def stats(self):
+        return {
+            'pending': self.pending,
+            'accepted': self.accepted,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'resumed': self.resumed,
+            'queue_depth': {stage: queue.qsize() for stage, queue in self._queues.items()},
+            'workers': dict(self.workers),
+            'mean_stage_ms': {
+                stage: round(self.stage_seconds[stage] / self.stage_runs[stage] * 1000.0, 1)
+                if self.stage_runs[stage] else None
+                for stage in STAGES
+            }
+        }
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'drd_gan', 'models')
+
+
+class CachedArtifact:
+    def __init__(self, key, path, etag, version_id, size, hit):
+        self.key = key
+        self.path = path
+        self.etag = etag
+        self.version_id = version_id
+        self.size = size
+        self.hit = hit
+
+    @property
+    def version(self):
+        return self.version_id or self.etag
+
+
+class ArtifactCache:
+    """Local copy of S3 model artifacts, addressed by key + ETag/VersionId.
+
+    Each fetch costs one HEAD request; the object body is only downloaded
+    when no file for that exact ETag/version is on disk yet. Files are never
+    modified once written, so workers can memory-map them safely.
+    """
+
+    def __init__(self, s3_client, bucket_name, cache_dir=None):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.cache_dir = Path(cache_dir or os.getenv('MODEL_CACHE_DIR', DEFAULT_CACHE_DIR))
+        self.hits = 0
+        self.misses = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+
+    def _entry_path(self, key, etag, version_id):
+        digest = hashlib.sha256(f"{key}\0{etag}\0{version_id or ''}".encode()).hexdigest()
+        # Keep the original file name so loaders can rely on the extension
+        return self.cache_dir / digest[:2] / digest / Path(key).name
+
+    def _ref_path(self, key):
+        return self.cache_dir / 'refs' / hashlib.sha256(key.encode()).hexdigest()
+
+    def _download(self, key, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.part")
+        try:
+            self.s3_client.download_file(self.bucket_name, key, str(temp_path))
+            # Atomic publish: concurrent workers never see a partial file
+            os.replace(temp_path, path)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+
+    def _write_ref(self, key, path):
+        ref_path = self._ref_path(key)
+        ref_path.parent.mkdir(parents=True, exist_ok=True)
+        ref_path.write_text(str(path.relative_to(self.cache_dir)))
+
+    def _cached_from_ref(self, key):
+        ref_path = self._ref_path(key)
+        if not ref_path.is_file():
+            return None
+        path = self.cache_dir / ref_path.read_text().strip()
+        return path if path.is_file() else None
+
+    def version(self, key):
+        """ETag/VersionId of the current object, from a HEAD request only."""
+        try:
+            head = self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
+        except Exception as e:
+            # Same offline behaviour as fetch(): an unvalidated cached copy has no version
+            if self._cached_from_ref(key) is None:
+                raise
+            print(f"Using cached {key} without validation: {str(e)}")
+            return None
+        return head.get('VersionId') or head.get('ETag', '').strip('"')
+
+    def fetch(self, key):
+        try:
+            head = self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
+        except Exception as e:
+            # S3 unreachable: fall back to the last version we downloaded
+            path = self._cached_from_ref(key)
+            if path is None:
+                raise
+            print(f"Using cached {key} without validation: {str(e)}")
+            with self._lock:
+                self.hits += 1
+                self.bytes_saved += path.stat().st_size
+            return CachedArtifact(key, path, None, None, path.stat().st_size, True)
+
+        etag = head.get('ETag', '').strip('"')
+        version_id = head.get('VersionId')
+        size = head.get('ContentLength')
+        path = self._entry_path(key, etag, version_id)
+
+        hit = path.is_file() and (size is None or path.stat().st_size == size)
+        if not hit:
+            self._download(key, path)
+            size = path.stat().st_size
+        self._write_ref(key, path)
+
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.bytes_saved += size
+            else:
+                self.misses += 1
+                self.bytes_downloaded += size
+
+        return CachedArtifact(key, path, etag, version_id, size, hit)
+
+    def stats(self):
+        return {
+            'cache_dir': str(self.cache_dir),
+            'hits': self.hits,
+            'misses': self.misses,
+            'bytes_downloaded': self.bytes_downloaded,
+            'bytes_saved': self.bytes_saved
+        }
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from collections import Counter
+import numpy as np
+
+
+class BatchScheduler:
+    """Groups concurrent single-item requests into one batched model call.
+
+    Callers `submit` one input and await its own output row. A background
+    task waits up to `max_wait_ms` after the first queued item for more work,
+    stacks up to `max_batch_size` inputs and runs `predict_fn` once.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=8, max_wait_ms=10.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = None
+        self._worker = None
+        self._loop = None
+
+        self.batches = 0
+        self.items = 0
+        self.failed_batches = 0
+        self.batch_sizes = Counter()
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item):
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Anything already waiting rides along without extra delay
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Skip callers that gave up while queued
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                wait = started - enqueued
+                self.total_queue_wait += wait
+                self.max_queue_wait = max(self.max_queue_wait, wait)
+            self.batches += 1
+            self.items += len(batch)
+            self.batch_sizes[len(batch)] += 1
+
+            try:
+                outputs = await self.predict_fn(np.stack([item for item, _, _ in batch]))
+            except Exception as e:
+                self.failed_batches += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(output)
+
+    def stats(self):
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'batches': self.batches,
+            'items': self.items,
+            'failed_batches': self.failed_batches,
+            'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+            'batch_size_histogram': dict(sorted(self.batch_sizes.items())),
+            'mean_queue_wait_ms': self.total_queue_wait / self.items * 1000.0 if self.items else 0.0,
+            'max_queue_wait_ms': self.max_queue_wait * 1000.0,
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0
+        }
@@ -0,0 +1,114 @@
+import abc
+import os
+import threading
+import numpy as np
+
+# S3 key of the artifact each backend loads
+CNN_MODEL_KEYS = {
+    'keras': 'DR_model_final.h5',
+    'tflite': 'DR_model_final.tflite',
+    'onnx': 'DR_model_final.onnx'
+}
+
+
+class CNNBackend(abc.ABC):
+    """Runs the DR grading CNN: float32 (N, 224, 224, 3) in, (N, 5) softmax out."""
+
+    name = None
+
+    def __init__(self, model_path):
+        self.model_path = str(model_path)
+
+    @abc.abstractmethod
+    def predict(self, batch):
+        """Class probabilities for a preprocessed batch."""
+
+    def size_bytes(self):
+        return os.path.getsize(self.model_path)
+
+
+class KerasBackend(CNNBackend):
+    name = 'keras'
+
+    def __init__(self, model_path):
+        super().__init__(model_path)
+        from keras._tf_keras.keras.models import load_model
+        self.model = load_model(self.model_path)
+
+    def predict(self, batch):
+        return self.model.predict(batch, verbose=0)
+
+    def size_bytes(self):
+        total = 0
+        for weight in self.model.weights:
+            dtype = getattr(weight.dtype, 'name', weight.dtype)
+            total += int(np.prod(weight.shape)) * np.dtype(dtype).itemsize
+        return total
+
+
+class TFLiteBackend(CNNBackend):
+    name = 'tflite'
+
+    def __init__(self, model_path, num_threads=None):
+        super().__init__(model_path)
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            # Full TensorFlow ships the same interpreter
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self.interpreter = Interpreter(model_path=self.model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        # An interpreter holds one set of tensors, so calls must not overlap
+        self._lock = threading.Lock()
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        with self._lock:
+            if tuple(self.interpreter.get_input_details()[0]['shape']) != batch.shape:
+                self.interpreter.resize_tensor_input(self.input_index, batch.shape)
+                self.interpreter.allocate_tensors()
+            self.interpreter.set_tensor(self.input_index, batch)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self.output_index).copy()
+
+
+class OnnxBackend(CNNBackend):
+    name = 'onnx'
+
+    def __init__(self, model_path, num_threads=None):
+        super().__init__(model_path)
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("CNN_BACKEND=onnx requires the onnxruntime package")
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(
+            self.model_path,
+            sess_options=options,
+            providers=['CPUExecutionProvider']
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+BACKENDS = {
+    KerasBackend.name: KerasBackend,
+    TFLiteBackend.name: TFLiteBackend,
+    OnnxBackend.name: OnnxBackend
+}
+
+
+def create_backend(name, model_path, num_threads=None):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown CNN backend: {name}")
+    if name == KerasBackend.name:
+        return KerasBackend(model_path)
+    return BACKENDS[name](model_path, num_threads=num_threads)
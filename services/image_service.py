@@ -1,25 +1,104 @@
+import asyncio
+import io
 import cloudinary.uploader
 from typing import Optional
+import shutil
+import time
 import os
+import uuid
+from instrumentation import timed
+
+UPLOAD_FOLDER = "retinal_images"
+
+class CloudinaryUploader:
+    def upload(self, file, public_id: str) -> str:
+        if isinstance(file, (bytes, bytearray)):
+            file = io.BytesIO(file)
+        result = cloudinary.uploader.upload(
+            file,
+            folder=UPLOAD_FOLDER,
+            public_id=public_id,
+            resource_type="image"
+        )
+        return result.get('secure_url')
+
+    def delete(self, public_id: str):
+        cloudinary.uploader.destroy(f"{UPLOAD_FOLDER}/{public_id}", resource_type="image")
+
+class LocalUploader:
+    """Stores images on local disk; stands in for Cloudinary in development
+    and benchmarks. `latency_ms` simulates the network round trip."""
+
+    def __init__(self, root: str, latency_ms: float = 0.0):
+        self.root = os.path.abspath(root)
+        self.latency_ms = latency_ms
+
+    def _path(self, public_id: str) -> str:
+        return os.path.join(self.root, UPLOAD_FOLDER, public_id)
+
+    def upload(self, file, public_id: str) -> str:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        path = self._path(public_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if isinstance(file, (bytes, bytearray)):
+            with open(path, 'wb') as f:
+                f.write(file)
+        else:
+            shutil.copyfile(file, path)
+        return f"file://{path}"
+
+    def delete(self, public_id: str):
+        if os.path.exists(self._path(public_id)):
+            os.remove(self._path(public_id))
+
+def get_uploader():
+    # IMAGE_UPLOADER=local keeps images on disk instead of sending them to Cloudinary
+    if os.getenv('IMAGE_UPLOADER', 'cloudinary').lower() == 'local':
+        return LocalUploader(
+            os.getenv('LOCAL_UPLOAD_DIR', 'uploads'),
+            float(os.getenv('LOCAL_UPLOAD_LATENCY_MS', '0'))
+        )
+    return CloudinaryUploader()
 
 class ImageService:
+    def __init__(self, uploader=None):
+        self.uploader = uploader or get_uploader()
+
     @staticmethod
-    async def upload_image(file_path: str, patient_id: str) -> Optional[str]:
+    def public_id_for(filename: str, patient_id: str) -> str:
+        # Get just the filename from the path
+        filename = os.path.basename(filename)
+        # Unique per upload: re-uploading a file name must not overwrite the
+        # asset an existing record points to, and rolling back an upload
+        # must only remove what that upload created
+        return f"patient_{patient_id}_{os.path.splitext(filename)[0]}_{uuid.uuid4().hex[:12]}"
+
+    @timed('image_service.upload_image')
+    async def upload_image(self, image, patient_id: str, filename: Optional[str] = None,
+                           public_id: Optional[str] = None) -> Optional[str]:
+        """
+        Upload a file path or the raw image bytes (``filename`` names the
+        upload). Pass a ``public_id`` from public_id_for() to be able to
+        delete the upload again.
+        """
+        filename = filename or image
         try:
-            # Get just the filename from the path
-            filename = os.path.basename(file_path)
-            
-            # Upload to cloudinary
-            result = cloudinary.uploader.upload(
-                file_path,
-                folder="retinal_images",
-                public_id=f"patient_{patient_id}_{os.path.splitext(filename)[0]}",
-                resource_type="image"
+            # The upload SDKs are blocking; keep them off the event loop
+            return await asyncio.to_thread(
+                self.uploader.upload,
+                image,
+                public_id or self.public_id_for(filename, patient_id)
             )
             
-            # Return the secure URL
-            return result.get('secure_url')
-            
         except Exception as e:
             # Include more detailed error information
-            raise Exception(f"Error uploading image: {str(e)} for file: {file_path}") 
\ No newline at end of file
+            raise Exception(f"Error uploading image: {str(e)} for file: {filename}")
+
+    @timed('image_service.delete_image')
+    async def delete_image(self, public_id: str):
+        try:
+            await asyncio.to_thread(self.uploader.delete, public_id)
+        except Exception as e:
+            # Best effort: a leftover image must not mask the original failure
+            print(f"Failed to delete uploaded image {public_id}: {str(e)}")
@@ -0,0 +1,72 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+THREAD = 'thread'
+PROCESS = 'process'
+
+
+class InferenceExecutor:
+    """Bounded pool that runs blocking decode/inference work off the event loop.
+
+    In `thread` mode callables share the process' models. In `process` mode
+    work runs in spawned workers, so submitted callables must be picklable
+    module-level functions that load models from their own process' registry.
+    """
+
+    def __init__(self, kind=THREAD, max_workers=None):
+        if kind not in (THREAD, PROCESS):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max(1, int(max_workers or min(4, os.cpu_count() or 1)))
+        self._executor = None
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def is_process(self):
+        return self.kind == PROCESS
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.is_process:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='inference'
+                )
+        return self._executor
+
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        try:
+            result = await loop.run_in_executor(self._get_executor(), partial(fn, *args, **kwargs))
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def stats(self):
+        return {
+            'kind': self.kind,
+            'max_workers': self.max_workers,
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'failed': self.failed
+        }
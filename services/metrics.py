@@ -0,0 +1,70 @@
+import time
+from prometheus_client import Counter, Gauge, Histogram
+
+# Request latency buckets, in seconds: fast reads up to slow report generations
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HTTP_REQUESTS = Counter(
+    'dr_api_http_requests_total', 'HTTP requests by route template and status',
+    ['method', 'route', 'status']
+)
+HTTP_REQUEST_DURATION = Histogram(
+    'dr_api_http_request_duration_seconds', 'HTTP request latency, until the response body is sent',
+    ['method', 'route'], buckets=REQUEST_BUCKETS
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    'dr_api_http_requests_in_progress', 'HTTP requests being served', ['method']
+)
+
+ADMISSION_ACTIVE = Gauge('dr_api_admission_active', 'Inference requests holding an admission slot')
+ADMISSION_QUEUED = Gauge('dr_api_admission_queued', 'Inference requests waiting for a slot', ['priority'])
+ADMISSION_REJECTED = Counter(
+    'dr_api_admission_rejected_total', 'Inference requests answered with 503', ['priority', 'reason']
+)
+
+OPENAI_TOKENS = Counter('dr_api_openai_tokens_total', 'Tokens used by report completions', ['model', 'kind'])
+
+UNMATCHED_ROUTE = 'unmatched'
+
+
+def _route_template(scope):
+    # Label by path template (/get-prediction/{patient_id}), never the raw
+    # path, so the number of series stays bounded. The router records the
+    # matched route on the scope while handling the request.
+    route = scope.get('route')
+    return getattr(route, 'path', None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route request counts and latency, and
+    in-flight requests by method. Latency runs until the last body chunk is
+    sent, so streamed responses are measured in full.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        method = scope['method']
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = _route_template(scope)
+            HTTP_REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
+            in_progress.dec()
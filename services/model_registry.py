@@ -0,0 +1,176 @@
+import asyncio
+import io
+import time
+from config.inference_config import InferenceConfig
+from services.model_service import ModelService
+
+
+def _import_torchvision():
+    # torch/torchvision have to be imported before TensorFlow; the reverse
+    # order crashes some wheel combinations. Both loaders call this first,
+    # so the order holds whichever model a process loads first.
+    import torchvision  # noqa: F401
+
+
+def _model_size_bytes(model):
+    if hasattr(model, 'size_bytes'):
+        return model.size_bytes()
+
+    import torch
+
+    if isinstance(model, torch.jit.ScriptModule):
+        # Frozen modules keep their weights as graph constants
+        tensors = list(model.parameters()) + list(model.buffers())
+        for node in model.graph.findAllNodes('prim::Constant'):
+            if node.output().type().kind() == 'TensorType':
+                tensors.append(node.output().toIValue())
+        return sum(t.numel() * t.element_size() for t in tensors)
+
+    if isinstance(model, torch.nn.Module):
+        if any(type(m).__module__.startswith('torch.ao.nn.quantized') for m in model.modules()):
+            # Quantized modules hold packed weights outside parameters()
+            buffer = io.BytesIO()
+            torch.save(model.state_dict(), buffer)
+            return buffer.tell()
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+
+    return 0
+
+
+class LoadedModel:
+    def __init__(self, name, model, load_seconds, size_bytes):
+        self.name = name
+        self.model = model
+        self.load_seconds = load_seconds
+        self.size_bytes = size_bytes
+        self.loaded_at = time.time()
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'load_seconds': round(self.load_seconds, 3),
+            'size_bytes': self.size_bytes,
+            'loaded_at': self.loaded_at
+        }
+
+
+class ModelRegistry:
+    """Process-wide holder for the CNN and GAN so each is loaded only once."""
+
+    CNN = 'cnn'
+    GAN = 'gan'
+
+    def __init__(self, model_service=None, config=None):
+        self.model_service = model_service or ModelService()
+        self.config = config or InferenceConfig()
+        self.device = 'cpu'
+        self._models = {}
+        self._locks = {}
+        # One load at a time: torch and TensorFlow must not be imported
+        # concurrently from two loader threads
+        self._load_lock = asyncio.Lock()
+
+    def _lock(self, name):
+        if name not in self._locks:
+            self._locks[name] = asyncio.Lock()
+        return self._locks[name]
+
+    async def _get_or_load(self, name, loader):
+        entry = self._models.get(name)
+        if entry is not None:
+            return entry.model
+
+        async with self._lock(name):
+            # Another request may have finished loading while we waited
+            entry = self._models.get(name)
+            if entry is None:
+                async with self._load_lock:
+                    start = time.perf_counter()
+                    model = await loader()
+                    load_seconds = time.perf_counter() - start
+                    size_bytes = await asyncio.to_thread(_model_size_bytes, model)
+                entry = LoadedModel(name, model, load_seconds, size_bytes)
+                self._models[name] = entry
+                print(
+                    f"Loaded {name} model in {entry.load_seconds:.2f}s "
+                    f"({entry.size_bytes / (1024 * 1024):.1f} MB)"
+                )
+        return entry.model
+
+    # Loaders keep their blocking work (imports, checkpoint reads, tracing,
+    # calibration) in worker threads so the event loop keeps serving requests
+
+    def _build_generator(self):
+        from models.architecture import Generator
+
+        _import_torchvision()
+        return Generator().to(self.device)
+
+    def _prepare_generator(self, generator):
+        from models.architecture import compile_generator
+
+        generator.eval()
+        if self.config.gan_precision == 'int8':
+            quantized = self._quantize_generator(generator)
+            if quantized is not None:
+                return quantized
+        if self.config.compile_generator:
+            generator = compile_generator(generator)
+        return generator
+
+    async def _load_generator(self):
+        generator = await asyncio.to_thread(self._build_generator)
+        generator = await self.model_service.load_gan_model(generator, self.device)
+        return await asyncio.to_thread(self._prepare_generator, generator)
+
+    def _quantize_generator(self, generator):
+        from models.architecture import quantize_generator, load_calibration_batches
+        from services.prediction_service import enhance_transform
+
+        if not self.config.gan_calibration_dir:
+            print("GAN_PRECISION=int8 needs GAN_CALIBRATION_DIR; serving fp32 Generator")
+            return None
+        batches = load_calibration_batches(
+            self.config.gan_calibration_dir,
+            enhance_transform(),
+            limit=self.config.gan_calibration_images
+        )
+        if not batches:
+            print(f"No calibration images in {self.config.gan_calibration_dir}; serving fp32 Generator")
+            return None
+        return quantize_generator(generator, batches)
+
+    async def _load_cnn(self):
+        await asyncio.to_thread(_import_torchvision)
+        return await self.model_service.load_cnn_model(
+            self.config.cnn_backend,
+            self.config.cnn_threads
+        )
+
+    async def get_cnn_model(self):
+        return await self._get_or_load(self.CNN, self._load_cnn)
+
+    async def get_gan_model(self):
+        return await self._get_or_load(self.GAN, self._load_generator)
+
+    async def load_all(self):
+        await self.get_gan_model()
+        await self.get_cnn_model()
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def stats(self):
+        return {
+            'models': {name: entry.to_dict() for name, entry in self._models.items()},
+            'total_size_bytes': sum(entry.size_bytes for entry in self._models.values()),
+            'versions': dict(self.model_service.versions),
+            'cnn_backend': self.config.cnn_backend,
+            'gan_precision': self.config.gan_precision,
+            'artifact_cache': self.model_service.artifact_cache.stats()
+        }
+
+
+# Shared by every PredictionService in this process
+model_registry = ModelRegistry()
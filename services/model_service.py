@@ -1,53 +1,92 @@
-import boto3
+import asyncio
 import os
-import io
-import torch
-from pathlib import Path
-from keras._tf_keras.keras.models import load_model
-import tempfile
+from config.aws_config import configure_aws
+from services.artifact_cache import ArtifactCache
+from services.cnn_backends import CNN_MODEL_KEYS, create_backend
+from instrumentation import timed
+
+GAN_MODEL_KEY = 'enhanced_gan_models.pth'
 
 class ModelService:
     def __init__(self):
-        self.s3_client = boto3.client(
-            's3',
-            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-            region_name=os.getenv('AWS_REGION', 'us-east-1')
-        )
         self.bucket_name = os.getenv('AWS_BUCKET_NAME')
-        
-    async def download_model_from_s3(self, key):
+        self._s3_client = None
+        self._artifact_cache = None
+        # S3 ETag/VersionId of every artifact loaded by this service
+        self.versions = {}
+
+    @property
+    def s3_client(self):
+        # Created on first use: building the S3 client imports boto3
+        if self._s3_client is None:
+            self._s3_client = configure_aws()
+        return self._s3_client
+
+    @property
+    def artifact_cache(self):
+        if self._artifact_cache is None:
+            self._artifact_cache = ArtifactCache(self.s3_client, self.bucket_name)
+        return self._artifact_cache
+
+    @timed('model_service.get_model_path')
+    async def get_model_path(self, key):
         try:
-            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
-            return response['Body'].read()
+            # HEAD and download are blocking boto3 calls
+            artifact = await asyncio.to_thread(self.artifact_cache.fetch, key)
+            self.versions[key] = artifact.version
+            return artifact.path
         except Exception as e:
             raise Exception(f"Error downloading model from S3: {str(e)}")
-            
+
+    async def get_model_version(self, key):
+        """Version of an artifact; looked up with a HEAD request if it was never loaded here."""
+        if key not in self.versions:
+            try:
+                self.versions[key] = await asyncio.to_thread(self.artifact_cache.version, key)
+            except Exception as e:
+                raise Exception(f"Error looking up model version in S3: {str(e)}")
+        return self.versions[key]
+
+    async def download_model_from_s3(self, key):
+        path = await self.get_model_path(key)
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def _load_checkpoint(self, path, device):
+        import torch
+
+        try:
+            # Memory-mapped load lets every worker share the page cache
+            return torch.load(path, map_location=device, mmap=True), True
+        except (TypeError, RuntimeError):
+            # Older torch releases or legacy (non-zip) checkpoints
+            return torch.load(path, map_location=device), False
+
+    def _load_gan_weights(self, generator, path, device):
+        checkpoint, mmapped = self._load_checkpoint(path, device)
+        if mmapped:
+            try:
+                # Point parameters at the mapped storage instead of copying
+                generator.load_state_dict(checkpoint['model_state_dict'], assign=True)
+                return generator
+            except TypeError:
+                pass
+        generator.load_state_dict(checkpoint['model_state_dict'])
+        return generator
+
     async def load_gan_model(self, generator, device):
         try:
-            model_bytes = await self.download_model_from_s3('enhanced_gan_models.pth')
-            checkpoint = torch.load(io.BytesIO(model_bytes), map_location=device)
-            generator.load_state_dict(checkpoint['model_state_dict'])
-            return generator
+            path = await self.get_model_path(GAN_MODEL_KEY)
+            # torch.load and load_state_dict block; keep them off the event loop
+            return await asyncio.to_thread(self._load_gan_weights, generator, path, device)
         except Exception as e:
             raise Exception(f"Error loading GAN model: {str(e)}")
-            
-    async def load_cnn_model(self):
+
+    async def load_cnn_model(self, backend='keras', num_threads=None):
         try:
-            model_bytes = await self.download_model_from_s3('DR_model_final.h5')
-            
-            # Create a temporary file to save the model
-            with tempfile.NamedTemporaryFile(suffix='.h5', delete=False) as temp_model_file:
-                temp_model_file.write(model_bytes)
-                temp_model_path = temp_model_file.name
-            
-            try:
-                # Load the model from the temporary file
-                model = load_model(temp_model_path)
-                return model
-            finally:
-                # Clean up the temporary file
-                os.remove(temp_model_path)
-            
+            if backend not in CNN_MODEL_KEYS:
+                raise ValueError(f"Unknown CNN backend: {backend}")
+            path = await self.get_model_path(CNN_MODEL_KEYS[backend])
+            return await asyncio.to_thread(create_backend, backend, path, num_threads)
         except Exception as e:
-            raise Exception(f"Error loading CNN model: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Error loading CNN model: {str(e)}")
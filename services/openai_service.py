@@ -1,151 +1,358 @@
 import os
-from openai import OpenAI
-from datetime import datetime
+import hashlib
+import json
+import time
 from dotenv import load_dotenv
+from instrumentation import timed
+from services.metrics import OPENAI_TOKENS
 
 load_dotenv()
 
-class OpenAIService:
+# Report sections, in the order the model writes them
+SECTION_FIELDS = (
+    "patient_medical_assessment",
+    "dr_status_analysis",
+    "classification_details",
+    "vulnerable_areas_analysis",
+    "risk_assessment",
+    "recommendations",
+    "follow_up_plan"
+)
+
+# Inputs that determine a patient's report; it is reused while they are unchanged
+PROMPT_PREDICTION_FIELDS = (
+    "dr_detection_result",
+    "severity_level",
+    "prediction_confidence",
+    "detailed_predictions"
+)
+PROMPT_PATIENT_FIELDS = (
+    "patient_id",
+    "patient_name",
+    "date_of_birth",
+    "gender",
+    "vision_problems",
+    "visual_acuity_right",
+    "visual_acuity_left",
+    "blood_sugar_fasting",
+    "blood_pressure",
+    "image_url"
+)
+# Bump when the prompt text changes so earlier reports are not reused
+PROMPT_VERSION = 2
+
+# What each section covers; compiled once into the system prompt below
+SECTION_GUIDANCE = {
+    "patient_medical_assessment": "visual acuity, blood pressure and fasting blood sugar, reported vision problems, overall health",
+    "dr_status_analysis": "the DR result and severity, their clinical significance, model confidence, correlation with symptoms",
+    "classification_details": "findings supporting the grade, DR features implied, comparison with standard grading criteria",
+    "vulnerable_areas_analysis": "retinal regions likely affected, expected pathological changes, macular and peripheral involvement",
+    "risk_assessment": "current risk level, systemic contributors, progression and complication risk",
+    "recommendations": "interventions, lifestyle changes, blood sugar management, vision protection",
+    "follow_up_plan": "timing of the next examination, diagnostic tests, monitoring schedule, referrals"
+}
+
+SYSTEM_PROMPT = (
+    "You write diabetic retinopathy screening reports for clinicians from patient data and "
+    "the output of a DR grading model. Use formal, specific clinical prose with quantitative "
+    "detail where available; no markdown, headings or list markers. Reply with a JSON object "
+    "whose string fields are:\n"
+    + "\n".join(f"{field}: {guidance}" for field, guidance in SECTION_GUIDANCE.items())
+)
+
+# Structured output: the reply maps one-to-one onto the Report section fields
+REPORT_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "dr_report",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {field: {"type": "string"} for field in SECTION_FIELDS},
+            "required": list(SECTION_FIELDS),
+            "additionalProperties": False
+        }
+    }
+}
+
+_client = None
+
+def get_openai_client():
+    """
+    AsyncOpenAI client shared by every request in the worker, so completions
+    reuse pooled keep-alive connections. OPENAI_BASE_URL points it at another
+    OpenAI-compatible server, e.g. scripts/mock_openai_server.py.
+    """
+    global _client
+    if _client is None:
+        import httpx
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        max_connections = int(os.getenv('OPENAI_MAX_CONNECTIONS', '20'))
+        _client = AsyncOpenAI(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            base_url=os.getenv('OPENAI_BASE_URL') or None,
+            timeout=float(os.getenv('OPENAI_TIMEOUT_SECONDS', '120')),
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections
+                )
+            )
+        )
+    return _client
+
+async def close_openai_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+def parse_sections(report_content: str) -> dict:
+    """Map the model's JSON reply onto the Report section fields."""
+    try:
+        sections = json.loads(report_content)
+    except ValueError as e:
+        raise ValueError(f"Report output is not valid JSON: {str(e)}")
+    if not isinstance(sections, dict):
+        raise ValueError("Report output is not a JSON object")
+    missing = [field for field in SECTION_FIELDS if not isinstance(sections.get(field), str)]
+    if missing:
+        raise ValueError(f"Report output is missing sections: {', '.join(missing)}")
+    return {field: sections[field].strip() for field in SECTION_FIELDS}
+
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '"': '"', '\\': '\\', '/': '/'}
+
+class SectionStream:
+    """
+    Incrementally decodes the streamed JSON reply, returning the text of each
+    section's string value as it arrives. parse_sections() on the full
+    content remains the source of truth for what is stored.
+    """
+
+    def __init__(self):
+        self.content = ""
+        self._state = 'outside'
+        self._key = ""
+        self._field = None
+        self._unicode = ""
+        self._high_surrogate = None
+
+    def _decoded(self, char):
+        # Collects the decoded characters of the current string value
+        if self._state == 'value':
+            if char == '\\':
+                self._state = 'escape'
+            elif char == '"':
+                self._state = 'outside'
+            else:
+                return char
+        elif self._state == 'escape':
+            if char == 'u':
+                self._state, self._unicode = 'unicode', ""
+            else:
+                self._state = 'value'
+                return _ESCAPES.get(char, char)
+        elif self._state == 'unicode':
+            self._unicode += char
+            if len(self._unicode) == 4:
+                self._state = 'value'
+                code = int(self._unicode, 16)
+                if 0xD800 <= code < 0xDC00:
+                    self._high_surrogate = code
+                    return ""
+                if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+                    code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+                self._high_surrogate = None
+                return chr(code)
+        return ""
+
+    def feed(self, delta: str):
+        """Return [(section field, new text)] for the text added by `delta`."""
+        self.content += delta
+        updates = []
+        for char in delta:
+            if self._state == 'outside':
+                if char == '"':
+                    self._state, self._key = 'key', ""
+            elif self._state == 'key':
+                if char == '"':
+                    self._state = 'after_key'
+                else:
+                    self._key += char
+            elif self._state == 'after_key':
+                if char == ':':
+                    self._state = 'before_value'
+            elif self._state == 'before_value':
+                if char == '"':
+                    self._state = 'value'
+                    self._field = self._key if self._key in SECTION_FIELDS else None
+            else:
+                text = self._decoded(char)
+                if text and self._field is not None:
+                    if updates and updates[-1][0] == self._field:
+                        updates[-1] = (self._field, updates[-1][1] + text)
+                    else:
+                        updates.append((self._field, text))
+        return updates
+
+class TokenUsage:
+    """Token and latency totals for report completions in this worker."""
+
     def __init__(self):
-        self.api_key = os.getenv('OPENAI_API_KEY')
-        self.client = OpenAI(api_key=self.api_key)
+        self.calls = 0
+        self.failures = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_seconds = 0.0
+
+    def record(self, usage: dict):
+        self.calls += 1
+        self.prompt_tokens += usage.get('prompt_tokens') or 0
+        self.completion_tokens += usage.get('completion_tokens') or 0
+        OPENAI_TOKENS.labels(usage['model'], 'prompt').inc(usage.get('prompt_tokens') or 0)
+        OPENAI_TOKENS.labels(usage['model'], 'completion').inc(usage.get('completion_tokens') or 0)
+        self.latency_seconds += usage['latency_ms'] / 1000.0
+        print(
+            f"Report completion: {usage.get('prompt_tokens')} prompt + "
+            f"{usage.get('completion_tokens')} completion tokens in {usage['latency_ms']:.0f}ms"
+        )
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'failures': self.failures,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'mean_prompt_tokens': self.prompt_tokens / self.calls if self.calls else None,
+            'mean_completion_tokens': self.completion_tokens / self.calls if self.calls else None,
+            'mean_latency_ms': self.latency_seconds * 1000.0 / self.calls if self.calls else None
+        }
+
+token_usage = TokenUsage()
+
+class OpenAIService:
+    def __init__(self, client=None):
+        self.model = os.getenv('OPENAI_MODEL', 'gpt-4o')
+        # json_object for models without structured outputs; the system prompt names the fields
+        if os.getenv('OPENAI_RESPONSE_FORMAT', 'json_schema') == 'json_object':
+            self.response_format = {"type": "json_object"}
+        else:
+            self.response_format = REPORT_RESPONSE_FORMAT
+        self.client = client or get_openai_client()
+
+    def fingerprint(self, prediction_data: dict, patient_details: dict) -> str:
+        """Hash of everything that determines the generated report."""
+        inputs = {
+            'model': self.model,
+            'prompt_version': PROMPT_VERSION,
+            'prediction': {field: prediction_data.get(field) for field in PROMPT_PREDICTION_FIELDS},
+            'patient': {field: patient_details.get(field) for field in PROMPT_PATIENT_FIELDS}
+        }
+        canonical = json.dumps(inputs, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def build_prompt(self, prediction_data: dict, patient_details: dict) -> str:
+        """Per-patient part of the prompt: the inputs as compact JSON, without empty fields."""
+        patient = {
+            'name': patient_details.get('patient_name'),
+            'date_of_birth': patient_details.get('date_of_birth'),
+            'gender': patient_details.get('gender'),
+            'vision_problems': patient_details.get('vision_problems'),
+            'visual_acuity_right': patient_details.get('visual_acuity_right'),
+            'visual_acuity_left': patient_details.get('visual_acuity_left'),
+            'blood_sugar_fasting': patient_details.get('blood_sugar_fasting'),
+            'blood_pressure': patient_details.get('blood_pressure')
+        }
+        confidence = prediction_data.get('prediction_confidence') or 0.0
+        screening = {
+            'dr_status': prediction_data.get('dr_detection_result', 'Unknown'),
+            'severity_level': prediction_data.get('severity_level', 'Unknown'),
+            'confidence': f"{confidence * 100:.1f}%",
+            'class_probabilities': {
+                grade: round(float(probability), 3)
+                for grade, probability in (prediction_data.get('detailed_predictions') or {}).items()
+            }
+        }
+        inputs = {
+            'patient': {key: value for key, value in patient.items() if value not in (None, '')},
+            'screening': screening
+        }
+        return json.dumps(inputs, separators=(',', ':'), default=str)
 
-    async def generate_report(self, prediction_data: dict, patient_details: dict) -> dict:
+    def _request(self, prediction_data: dict, patient_details: dict) -> dict:
+        return {
+            'model': self.model,
+            'messages': [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": self.build_prompt(prediction_data, patient_details)}
+            ],
+            'response_format': self.response_format,
+            'max_tokens': 2000,
+            'temperature': 0.7
+        }
+
+    def _usage(self, usage, started, first_token_at=None) -> dict:
+        finished = time.perf_counter()
+        return {
+            'model': self.model,
+            'prompt_tokens': getattr(usage, 'prompt_tokens', None),
+            'completion_tokens': getattr(usage, 'completion_tokens', None),
+            'total_tokens': getattr(usage, 'total_tokens', None),
+            'latency_ms': round((finished - started) * 1000.0, 1),
+            'first_token_ms': round((first_token_at - started) * 1000.0, 1) if first_token_at else None
+        }
+
+    @timed('openai_service.generate_report')
+    async def generate_report(self, prediction_data: dict, patient_details: dict):
+        """Return (sections, usage): the seven Report section texts and the call's token accounting."""
+        started = time.perf_counter()
         try:
-            dr_status = prediction_data.get('dr_detection_result', 'Unknown')
-            severity_level = prediction_data.get('severity_level', 'Unknown')
-            confidence = prediction_data.get('prediction_confidence', 0.0)
-            detailed_predictions = prediction_data.get('detailed_predictions', {})
-
-            # Format patient details with all available information
-            patient_info = f"""
-            Patient Information:
-            - Name: {patient_details.get('patient_name', 'N/A')}
-            - Date of Birth: {patient_details.get('date_of_birth', 'N/A')}
-            - Gender: {patient_details.get('gender', 'N/A')}
-            - Vision Problems: {patient_details.get('vision_problems', 'N/A')}
-            - Visual Acuity (Right): {patient_details.get('visual_acuity_right', 'N/A')}
-            - Visual Acuity (Left): {patient_details.get('visual_acuity_left', 'N/A')}
-            - Blood Sugar (Fasting): {patient_details.get('blood_sugar_fasting', 'N/A')}
-            - Blood Pressure: {patient_details.get('blood_pressure', 'N/A')}
-            - Image URL: {patient_details.get('image_url', 'N/A')}
-            """
-
-            prompt = f"""
-            Based on the following patient information and examination results, generate a comprehensive medical report.
-            Ensure each section is clearly separated by line breaks and follows a consistent, formal medical format.
-
-            {patient_info}
-
-            Examination Results:
-            - DR Status: {dr_status}
-            - Severity Level: {severity_level}
-            - Confidence: {confidence:.1f}%
-            - Detailed Predictions: {detailed_predictions}
-
-            Generate a structured medical report with the following specific sections:
-
-            1. Patient Medical Assessment
-            - Current visual acuity analysis
-            - Vital signs evaluation (blood pressure, blood sugar)
-            - Reported vision problems and symptoms
-            - Overall health status assessment
-
-            2. DR Status Analysis
-            - Detailed interpretation of DR detection results
-            - Analysis of severity level and its clinical significance
-            - Confidence level interpretation
-            - Correlation with patient's symptoms
-
-            3. Classification Details
-            - Specific findings from the retinal examination
-            - Presence of DR-related features
-            - Quantitative analysis of detected abnormalities
-            - Comparison with standard classification criteria
-
-            4. Vulnerable Areas Analysis
-            - Identification of specific affected retinal regions
-            - Description of observed pathological changes
-            - Assessment of macular involvement
-            - Peripheral retina status
-
-            5. Risk Assessment
-            - Current risk level evaluation
-            - Contributing systemic factors
-            - Progression risk factors
-            - Complications risk analysis
-
-            6. Recommendations
-            - Immediate medical interventions required
-            - Lifestyle modifications needed
-            - Blood sugar management guidelines
-            - Vision protection measures
-
-            7. Follow-up Plan
-            - Specific timeline for next examination
-            - Required diagnostic tests
-            - Monitoring schedule
-            - Referral recommendations if needed
-
-            Important guidelines:
-            - Use clear, professional medical terminology
-            - Maintain a formal clinical tone
-            - Provide specific, actionable information
-            - Ensure each section is distinct and comprehensive
-            - Include quantitative data where available
-            - Avoid any special characters or formatting markers
-            
-            Example Wrong Format:
-            {{
-                "report": {{
-                    "blood_pressure": "120/80",
-                    "blood_sugar_fasting": 95.5,
-                    "classification_details": "Patient Name: John Doe\\nDOB: 1990-01-01\\nGender: Male",
-                    "confidence": 0.8788774013519287,
-                    "dr_status": "Positive",
-                    "dr_status_analysis": "**Patient Medical Assessment**",
-                    "follow_up_plan": "**Classification Details**"
-                }}
-            }}
-
-            Example Correct Format:
-            {{
-                "report": {{
-                    "blood_pressure": "120/80",
-                    "blood_sugar_fasting": 95.5,
-                    "classification_details": "Patient Name: John Doe\\nDOB: 1990-01-01\\nGender: Male",
-                    "confidence": 0.8788774013519287,
-                    "dr_status": "Positive",
-                    "dr_status_analysis": "Patient Medical Assessment",
-                    "follow_up_plan": "Classification Details"
-                }}
-            }}
-            """
-
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=2000,
-                temperature=0.7
+            response = await self.client.chat.completions.create(
+                **self._request(prediction_data, patient_details)
             )
+            sections = parse_sections(response.choices[0].message.content)
+        except Exception as e:
+            token_usage.failures += 1
+            raise Exception(f"OpenAI API error: {str(e)}")
 
-            report_content = response.choices[0].message.content.strip()
-            sections = report_content.split('\n\n')
-
-            return {
-                "patient_medical_assessment": sections[0] if len(sections) > 0 else "",
-                "dr_status_analysis": sections[1] if len(sections) > 1 else "",
-                "classification_details": sections[2] if len(sections) > 2 else "",
-                "vulnerable_areas_analysis": sections[3] if len(sections) > 3 else "",
-                "risk_assessment": sections[4] if len(sections) > 4 else "",
-                "recommendations": sections[5] if len(sections) > 5 else "",
-                "follow_up_plan": sections[6] if len(sections) > 6 else ""
-            }
+        usage = self._usage(response.usage, started)
+        token_usage.record(usage)
+        return sections, usage
 
+    @timed('openai_service.stream_report')
+    async def stream_report(self, prediction_data: dict, patient_details: dict):
+        """
+        Yield (section field, text) pieces as completion tokens arrive, then
+        ("report", (sections, usage)) once the reply is complete.
+        """
+        started = time.perf_counter()
+        first_token_at = None
+        try:
+            stream = await self.client.chat.completions.create(
+                **self._request(prediction_data, patient_details),
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+
+            sections = SectionStream()
+            completion_usage = None
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    completion_usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    first_token_at = first_token_at or time.perf_counter()
+                    for update in sections.feed(delta):
+                        yield update
+
+            report = parse_sections(sections.content)
         except Exception as e:
-            raise Exception(f"OpenAI API error: {str(e)}") 
\ No newline at end of file
+            token_usage.failures += 1
+            raise Exception(f"OpenAI API error: {str(e)}")
+
+        usage = self._usage(completion_usage, started, first_token_at)
+        token_usage.record(usage)
+        yield "report", (report, usage)
@@ -0,0 +1,107 @@
+import copy
+import bson
+from config.cache_config import CacheConfig
+from services.cache import TTLCache
+
+
+class PatientCache:
+    """Read-through cache of whole patient documents keyed by patient_id.
+
+    Lookups go to the in-process LRU first and then, when PATIENT_CACHE_REDIS_URL
+    is set, to a Redis shared by all workers. Writes through PatientService
+    invalidate both; another worker's in-process copy lives until its TTL.
+    """
+
+    KEY_PREFIX = 'patient:'
+
+    def __init__(self, config=None):
+        self.config = config or CacheConfig()
+        self.memory = TTLCache(self.config.patient_cache_size, self.config.patient_cache_ttl_seconds)
+        self._redis = None
+        # Bumped on every invalidation; a read that overlapped one is returned
+        # but not cached, since it may predate the write
+        self._generation = 0
+        self.loads = 0
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    @property
+    def redis(self):
+        if self._redis is None and self.config.patient_cache_redis_url:
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                raise ImportError("PATIENT_CACHE_REDIS_URL requires the redis package")
+            self._redis = redis.from_url(self.config.patient_cache_redis_url)
+        return self._redis
+
+    async def _shared_get(self, patient_id):
+        if self.redis is None:
+            return None
+        try:
+            payload = await self.redis.get(self.KEY_PREFIX + patient_id)
+        except Exception as e:
+            print(f"Patient cache lookup failed: {str(e)}")
+            return None
+        if payload is None:
+            self.shared_misses += 1
+            return None
+        self.shared_hits += 1
+        return bson.decode(payload)
+
+    async def _shared_set(self, patient_id, document):
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(
+                self.KEY_PREFIX + patient_id,
+                bson.encode(document),
+                ex=self.config.patient_cache_ttl_seconds
+            )
+        except Exception as e:
+            print(f"Patient cache write failed: {str(e)}")
+
+    async def get_or_load(self, patient_id, loader):
+        """
+        Return a copy of the patient document, calling `loader()` on a miss.
+        Missing patients (None) are not cached.
+        """
+        document = self.memory.get(patient_id)
+        if document is None:
+            generation = self._generation
+            document = await self._shared_get(patient_id)
+            if document is None:
+                self.loads += 1
+                document = await loader()
+                if document is not None and self._generation == generation:
+                    await self._shared_set(patient_id, document)
+            if document is not None and self._generation == generation:
+                self.memory.set(patient_id, document)
+        # Callers get their own copy so they cannot mutate the cached entry
+        return copy.deepcopy(document)
+
+    async def invalidate(self, *patient_ids):
+        self._generation += 1
+        for patient_id in patient_ids:
+            self.memory.delete(patient_id)
+        if self.redis is not None and patient_ids:
+            try:
+                await self.redis.delete(*(self.KEY_PREFIX + patient_id for patient_id in patient_ids))
+            except Exception as e:
+                print(f"Patient cache invalidation failed: {str(e)}")
+
+    def stats(self):
+        lookups = self.shared_hits + self.shared_misses
+        return {
+            'memory': self.memory.stats(),
+            'shared': {
+                'enabled': self.config.patient_cache_redis_url is not None,
+                'hits': self.shared_hits,
+                'misses': self.shared_misses,
+                'hit_rate': self.shared_hits / lookups if lookups else 0.0
+            },
+            'database_loads': self.loads
+        }
+
+
+patient_cache = PatientCache()
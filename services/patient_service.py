@@ -1,21 +1,30 @@
 from models.patient_model import Patient, PatientModel
+from services.patient_cache import patient_cache
+from instrumentation import timed
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from datetime import datetime
 
 
 class PatientService:
-    def __init__(self, db=None):
+    def __init__(self, db=None, cache=None):
         self.patient_model = PatientModel(db)
         self.db = db
+        # Shared by every request in the worker; see services/patient_cache.py
+        self.cache = cache or patient_cache
         
     async def initialize(self):
         if self.patient_model is not None:
             await self.patient_model.initialize(self.db)
         
+    @timed('patient_service.create_patient')
     async def create_patient(self, patient_data: Patient):
         try:
             if self.patient_model.collection is None:
                 await self.initialize()
             return await self.patient_model.create(patient_data)
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Database error: {str(e)}")
         
@@ -27,6 +36,14 @@ class PatientService:
         if self.patient_model is not None:
             await self.patient_model.close()
         
+    async def _get_patient_document(self, patient_id: str):
+        # One fetch of the full document serves every projection of it
+        async def load():
+            return await self.patient_model.collection.find_one({"patient_id": patient_id})
+
+        return await self.cache.get_or_load(patient_id, load)
+
+    @timed('patient_service.update_image_url')
     async def update_image_url(self, patient_id: str, image_url: str):
         try:
             if self.patient_model.collection is None:
@@ -43,7 +60,20 @@ class PatientService:
             return True
         except Exception as e:
             raise Exception(f"Database error: {str(e)}")
+        finally:
+            await self.cache.invalidate(patient_id)
+
+    @staticmethod
+    def _prediction_fields(prediction_result: dict) -> dict:
+        return {
+            "dr_detection_result": prediction_result['dr_status'],
+            "severity_level": prediction_result['severity_level'],
+            "prediction_confidence": prediction_result['confidence'],
+            "detailed_predictions": prediction_result['predictions'],
+            "updated_at": datetime.utcnow()
+        }
 
+    @timed('patient_service.update_prediction')
     async def update_prediction(self, patient_id: str, prediction_result: dict):
         try:
             if self.patient_model.collection is None:
@@ -51,13 +81,7 @@ class PatientService:
             
             result = await self.patient_model.collection.update_one(
                 {"patient_id": patient_id},
-                {"$set": {
-                    "dr_detection_result": prediction_result['dr_status'],
-                    "severity_level": prediction_result['severity_level'],
-                    "prediction_confidence": prediction_result['confidence'],
-                    "detailed_predictions": prediction_result['predictions'],
-                    "updated_at": datetime.utcnow()
-                }}
+                {"$set": self._prediction_fields(prediction_result)}
             )
             
             if result.modified_count == 0:
@@ -66,13 +90,41 @@ class PatientService:
             return True
         except Exception as e:
             raise Exception(f"Database error: {str(e)}")
+        finally:
+            await self.cache.invalidate(patient_id)
+
+    @timed('patient_service.update_analysis')
+    async def update_analysis(self, patient_id: str, image_url: str, prediction_result: dict):
+        """Store a new image URL and its prediction in a single write."""
+        try:
+            if self.patient_model.collection is None:
+                await self.initialize()
+            
+            result = await self.patient_model.collection.update_one(
+                {"patient_id": patient_id},
+                {"$set": {"image_url": image_url, **self._prediction_fields(prediction_result)}}
+            )
+            
+            if result.modified_count == 0:
+                raise Exception("Patient not found or analysis not updated")
+            
+            return True
+        except Exception as e:
+            raise Exception(f"Database error: {str(e)}")
+        finally:
+            await self.cache.invalidate(patient_id)
 
+    @timed('patient_service.get_prediction')
     async def get_prediction(self, patient_id: str):
         try:
             if self.patient_model.collection is None:
                 await self.initialize()
             
-            prediction_data = await self.patient_model.get_patient_prediction(patient_id)
+            patient = await self._get_patient_document(patient_id) or {}
+            prediction_data = {
+                field: patient[field]
+                for field in self.patient_model.PREDICTION_FIELDS if field in patient
+            }
             if not prediction_data:
                 raise Exception("Patient not found")
             
@@ -85,14 +137,13 @@ class PatientService:
         except Exception as e:
             raise Exception(f"Database error: {str(e)}")
 
+    @timed('patient_service.get_patient_details')
     async def get_patient_details(self, patient_id: str):
         try:
             if self.patient_model.collection is None:
                 await self.initialize()
             
-            patient = await self.patient_model.collection.find_one(
-                {"patient_id": patient_id}
-            )
+            patient = await self._get_patient_document(patient_id)
             
             if not patient:
                 raise Exception("Patient not found")
@@ -103,4 +154,50 @@ class PatientService:
             
             return patient
         except Exception as e:
-            raise Exception(f"Database error: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Database error: {str(e)}")
+
+    @timed('patient_service.get_existing_patient_ids')
+    async def get_existing_patient_ids(self, patient_ids: list) -> set:
+        try:
+            if self.patient_model.collection is None:
+                await self.initialize()
+            
+            cursor = self.patient_model.collection.find(
+                {"patient_id": {"$in": list(set(patient_ids))}},
+                {"patient_id": 1, "_id": 0}
+            )
+            return {doc["patient_id"] async for doc in cursor}
+        except Exception as e:
+            raise Exception(f"Database error: {str(e)}")
+
+    @timed('patient_service.bulk_update_analysis')
+    async def bulk_update_analysis(self, updates: list) -> dict:
+        """
+        Persist (patient_id, image_url, prediction_result) tuples with a single
+        unordered bulk write. Returns a map of failed update index to error message.
+        """
+        try:
+            if self.patient_model.collection is None:
+                await self.initialize()
+            if not updates:
+                return {}
+            
+            operations = [
+                UpdateOne(
+                    {"patient_id": patient_id},
+                    {"$set": {"image_url": image_url, **self._prediction_fields(prediction_result)}}
+                )
+                for patient_id, image_url, prediction_result in updates
+            ]
+            try:
+                await self.patient_model.collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                return {
+                    error['index']: error.get('errmsg', 'Write failed')
+                    for error in e.details.get('writeErrors', [])
+                }
+            finally:
+                await self.cache.invalidate(*(patient_id for patient_id, _, _ in updates))
+            return {}
+        except Exception as e:
+            raise Exception(f"Database error: {str(e)}")
@@ -0,0 +1,75 @@
+import copy
+from datetime import datetime, timedelta
+from services.cache import TTLCache
+
+
+class PredictionCache:
+    """Prediction results keyed by CNN model version and image content hash.
+
+    Lookups go to the in-process LRU first and then, when a database has
+    been attached, to the `prediction_cache` collection shared by all
+    workers. Mongo expires its entries through a TTL index on `expires_at`.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=86400, use_mongo=False):
+        self.memory = TTLCache(max_entries, ttl_seconds)
+        self.ttl_seconds = ttl_seconds
+        self.use_mongo = use_mongo
+        self.collection = None
+        self.mongo_hits = 0
+        self.mongo_misses = 0
+
+    async def attach(self, db):
+        if not self.use_mongo or db is None:
+            return
+        self.collection = db.prediction_cache
+        await self.collection.create_index('expires_at', expireAfterSeconds=0)
+
+    @staticmethod
+    def key_for(model_version, content_hash):
+        return f"{model_version}:{content_hash}"
+
+    async def get(self, key):
+        result = self.memory.get(key)
+        if result is None and self.collection is not None:
+            try:
+                document = await self.collection.find_one({'_id': key})
+            except Exception as e:
+                print(f"Prediction cache lookup failed: {str(e)}")
+                document = None
+            if document is not None and document['expires_at'] > datetime.utcnow():
+                self.mongo_hits += 1
+                result = document['result']
+                self.memory.set(key, result)
+            else:
+                self.mongo_misses += 1
+        # Callers get their own copy so they cannot mutate the cached entry
+        return copy.deepcopy(result) if result is not None else None
+
+    async def set(self, key, result):
+        self.memory.set(key, copy.deepcopy(result))
+        if self.collection is not None:
+            try:
+                await self.collection.replace_one(
+                    {'_id': key},
+                    {
+                        '_id': key,
+                        'result': result,
+                        'expires_at': datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+                    },
+                    upsert=True
+                )
+            except Exception as e:
+                print(f"Prediction cache write failed: {str(e)}")
+
+    def stats(self):
+        lookups = self.mongo_hits + self.mongo_misses
+        return {
+            'memory': self.memory.stats(),
+            'mongo': {
+                'enabled': self.collection is not None,
+                'hits': self.mongo_hits,
+                'misses': self.mongo_misses,
+                'hit_rate': self.mongo_hits / lookups if lookups else 0.0
+            }
+        }
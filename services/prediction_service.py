@@ -1,85 +1,239 @@
-import torch
+import asyncio
+import hashlib
+from functools import lru_cache
 from PIL import Image, ImageEnhance
 import numpy as np
-import cv2
-from torchvision import transforms
-from keras._tf_keras.keras.models import load_model
 import io
-from models.architecture import Generator
-from services.model_service import ModelService
-from keras._tf_keras.keras.preprocessing.image import load_img, img_to_array
+from config.inference_config import InferenceConfig
+from services.batch_scheduler import BatchScheduler
+from services.inference_executor import InferenceExecutor
+from services.model_registry import ModelRegistry, model_registry as default_model_registry
+from services.cnn_backends import CNN_MODEL_KEYS
+from services.prediction_cache import PredictionCache
+from instrumentation import timed
+
+CATEGORIES = ['No DR', 'Mild DR', 'Moderate DR', 'Severe DR', 'Proliferative DR']
+
+# torch, torchvision and the model runtimes are imported on first use so that
+# importing the API (and serving patient/report routes) does not load them.
+
+@lru_cache(maxsize=None)
+def enhance_transform():
+    from torchvision import transforms
+
+    return transforms.Compose([
+        transforms.Resize(256),
+        transforms.CenterCrop(256),
+        transforms.ToTensor(),
+        transforms.Normalize(
+            mean=[0.485, 0.456, 0.406],
+            std=[0.229, 0.224, 0.225]
+        )
+    ])
+
+# The functions below run inside the inference executor. They are module-level
+# so a process pool can pickle them; when no model is passed in, the worker
+# process loads its own copy through its registry.
+
+def _worker_model(name):
+    if name == ModelRegistry.CNN:
+        return asyncio.run(default_model_registry.get_cnn_model())
+    return asyncio.run(default_model_registry.get_gan_model())
+
+def _decode_image(source):
+    """Decode image bytes, a binary buffer or a path into an RGB uint8 array."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    with Image.open(source) as image:
+        return np.asarray(image.convert('RGB'))
+
+def _load_cnn_input(source):
+    if not isinstance(source, np.ndarray):
+        source = _decode_image(source)
+    # Same nearest-neighbour resize Keras' load_img applied
+    image = Image.fromarray(source).resize((224, 224), Image.NEAREST)
+    return np.asarray(image, dtype=np.float32) / 255.0
+
+def _cnn_predict(batch, cnn_model=None):
+    if cnn_model is None:
+        cnn_model = _worker_model(ModelRegistry.CNN)
+    return cnn_model.predict(batch)
+
+def _enhance(image, generator=None):
+    import torch
+    from torchvision import transforms
+
+    if generator is None:
+        generator = _worker_model(ModelRegistry.GAN)
+
+    img_tensor = enhance_transform()(image).unsqueeze(0)
+
+    with torch.no_grad():
+        enhanced = generator(img_tensor)
+
+    enhanced = enhanced.squeeze(0).cpu()
+    enhanced = enhanced * torch.tensor([0.229, 0.224, 0.225]).view(3, 1, 1) + \
+              torch.tensor([0.485, 0.456, 0.406]).view(3, 1, 1)
+    enhanced = enhanced.clamp(0, 1)
+    enhanced = transforms.ToPILImage()(enhanced)
+
+    return _post_enhance(enhanced)
+
+def _post_enhance(enhanced):
+    # Apply additional enhancements
+    enhanced = ImageEnhance.Contrast(enhanced).enhance(1.6)
+    enhanced = ImageEnhance.Sharpness(enhanced).enhance(1.7)
+    return enhanced
+
+def _enhance_full_resolution(source, tile_size, overlap, memory_budget_mb, generator=None):
+    from services.tiled_enhancement import enhance_tiled
+
+    if generator is None:
+        generator = _worker_model(ModelRegistry.GAN)
+
+    pixels = source if isinstance(source, np.ndarray) else _decode_image(source)
+    enhanced = enhance_tiled(pixels, generator, tile_size, overlap, memory_budget_mb)
+    enhanced = _post_enhance(Image.fromarray(enhanced))
+
+    # Encode in the worker too; returning bytes keeps process-pool transfers small
+    buffer = io.BytesIO()
+    enhanced.save(buffer, format='PNG')
+    return buffer.getvalue()
 
 class PredictionService:
-    def __init__(self):
-        self.device = torch.device('cpu')
-        self.model_service = ModelService()
-        self.transform = transforms.Compose([
-            transforms.Resize(256),
-            transforms.CenterCrop(256),
-            transforms.ToTensor(),
-            transforms.Normalize(
-                mean=[0.485, 0.456, 0.406],
-                std=[0.229, 0.224, 0.225]
-            )
-        ])
-        
+    def __init__(self, model_registry=None, config=None):
+        self.device = 'cpu'
+        self.config = config or InferenceConfig()
+        self.model_registry = model_registry or default_model_registry
+        self.model_service = self.model_registry.model_service
+        self.executor = InferenceExecutor(
+            self.config.executor_kind,
+            self.config.executor_workers
+        )
+        self.scheduler = BatchScheduler(
+            self._predict_batch,
+            max_batch_size=self.config.max_batch_size,
+            max_wait_ms=self.config.max_batch_wait_ms
+        )
+        self.prediction_cache = PredictionCache(
+            max_entries=self.config.prediction_cache_size,
+            ttl_seconds=self.config.prediction_cache_ttl_seconds,
+            use_mongo=self.config.prediction_cache_mongo
+        )
+
+    @property
+    def transform(self):
+        return enhance_transform()
+
+    async def _get_model(self, name):
+        # Process-pool workers load their own models
+        if self.executor.is_process:
+            return None
+        if name == ModelRegistry.CNN:
+            return await self.model_registry.get_cnn_model()
+        return await self.model_registry.get_gan_model()
+
+    @timed('prediction_service.decode_image')
+    async def decode_image(self, source):
+        try:
+            return await self.executor.run(_decode_image, source)
+        except Exception as e:
+            raise Exception(f"Error decoding image: {str(e)}")
+
+    @timed('prediction_service.enhance_image')
     async def enhance_image(self, image):
         try:
+            if isinstance(image, (bytes, bytearray, memoryview, str)) or hasattr(image, 'read'):
+                image = await self.decode_image(image)
             if not isinstance(image, Image.Image):
                 image = Image.fromarray(image)
-                
-            img_tensor = self.transform(image).unsqueeze(0).to(self.device)
-            
-            # Load GAN model from S3
-            generator = Generator().to(self.device)
-            generator = await self.model_service.load_gan_model(generator, self.device)
-            generator.eval()
-            
-            with torch.no_grad():
-                enhanced = generator(img_tensor)
-            
-            enhanced = enhanced.squeeze(0).cpu()
-            enhanced = enhanced * torch.tensor([0.229, 0.224, 0.225]).view(3, 1, 1) + \
-                      torch.tensor([0.485, 0.456, 0.406]).view(3, 1, 1)
-            enhanced = enhanced.clamp(0, 1)
-            enhanced = transforms.ToPILImage()(enhanced)
-            
-            # Apply additional enhancements
-            enhanced = ImageEnhance.Contrast(enhanced).enhance(1.6)
-            enhanced = ImageEnhance.Sharpness(enhanced).enhance(1.7)
-            
-            return enhanced
-            
+
+            generator = await self._get_model(ModelRegistry.GAN)
+            return await self.executor.run(_enhance, image, generator)
+
         except Exception as e:
             raise Exception(f"Error enhancing image: {str(e)}")
-        
-    async def predict_dr_grade(self, image_path):
+
+    @timed('prediction_service.enhance_image_tiled')
+    async def enhance_image_tiled(self, image, tile_size=None, overlap=None, memory_budget_mb=None):
         """
-        Predict DR grade from a retinal image
+        Enhance a retinal image at its native resolution and return PNG bytes.
+        The Generator runs on overlapping tiles, batched to fit the memory budget.
         """
         try:
-            # Load and preprocess image
-            image = load_img(image_path, target_size=(224, 224))
-            img_array = img_to_array(image) / 255.0
-            img_array = np.expand_dims(img_array, axis=0)
-            
-            # Load CNN model from S3
-            cnn_model = await self.model_service.load_cnn_model()
-            
-            # Get predictions
-            predictions = cnn_model.predict(img_array, verbose=0)[0]
-            pred_class = np.argmax(predictions)
-            
-            # Process results
-            categories = ['No DR', 'Mild DR', 'Moderate DR', 'Severe DR', 'Proliferative DR']
-            result = {
-                "dr_status": "Negative" if pred_class == 0 else "Positive",
-                "severity_level": categories[pred_class],
-                "confidence": float(predictions[pred_class]),
-                "predictions": {cat: float(pred) for cat, pred in zip(categories, predictions)}
-            }
-            
-            return result
+            generator = await self._get_model(ModelRegistry.GAN)
+            return await self.executor.run(
+                _enhance_full_resolution,
+                image,
+                tile_size or self.config.enhance_tile_size,
+                self.config.enhance_tile_overlap if overlap is None else overlap,
+                memory_budget_mb or self.config.enhance_memory_budget_mb,
+                generator
+            )
+
+        except Exception as e:
+            raise Exception(f"Error enhancing image: {str(e)}")
+
+    @timed('prediction_service.predict_batch')
+    async def _predict_batch(self, batch):
+        cnn_model = await self._get_model(ModelRegistry.CNN)
+        return await self.executor.run(_cnn_predict, batch, cnn_model)
+
+    def _format_prediction(self, predictions):
+        pred_class = int(np.argmax(predictions))
+        return {
+            "dr_status": "Negative" if pred_class == 0 else "Positive",
+            "severity_level": CATEGORIES[pred_class],
+            "confidence": float(predictions[pred_class]),
+            "predictions": {cat: float(pred) for cat, pred in zip(CATEGORIES, predictions)}
+        }
+
+    async def model_version(self):
+        key = CNN_MODEL_KEYS[self.config.cnn_backend]
+        # Set when this process loaded the CNN; process-pool mode never does,
+        # so the version is resolved once with a HEAD request instead
+        version = await self.model_service.get_model_version(key)
+        return f"{self.config.cnn_backend}:{version}"
+
+    async def cached_prediction(self, content_hash):
+        """Cached result for this image under the current model, or None."""
+        cache_key = self.prediction_cache.key_for(await self.model_version(), content_hash)
+        return await self.prediction_cache.get(cache_key)
+
+    @timed('prediction_service.preprocess')
+    async def preprocess(self, image):
+        # Decode and preprocess in memory, off the event loop
+        return await self.executor.run(_load_cnn_input, image)
+
+    @timed('prediction_service.predict_preprocessed')
+    async def predict_preprocessed(self, img_array, content_hash=None):
+        """Predict from a preprocess() array and cache the result under `content_hash`."""
+        # Concurrent requests are batched into a single predict call
+        predictions = await self.scheduler.submit(img_array)
+        result = self._format_prediction(predictions)
+
+        if content_hash is not None:
+            cache_key = self.prediction_cache.key_for(await self.model_version(), content_hash)
+            await self.prediction_cache.set(cache_key, result)
+        return result
+
+    async def predict_dr_grade(self, image, content_hash=None):
+        """
+        Predict DR grade from a retinal image given as encoded bytes, a
+        binary buffer, a file path or an already decoded RGB array
+        """
+        try:
+            if content_hash is None and isinstance(image, (bytes, bytearray)):
+                content_hash = hashlib.sha256(image).hexdigest()
+
+            # Re-uploads of the same image under the same model skip inference
+            if content_hash is not None:
+                cached = await self.cached_prediction(content_hash)
+                if cached is not None:
+                    return cached
+
+            img_array = await self.preprocess(image)
+            return await self.predict_preprocessed(img_array, content_hash)
             
         except Exception as e:
-            raise Exception(f"Prediction error: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Prediction error: {str(e)}") 
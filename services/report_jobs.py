@@ -0,0 +1,235 @@
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+import openai
+from pymongo import ReturnDocument
+from pymongo.errors import ConnectionFailure, ExecutionTimeout, WTimeoutError
+from config.report_job_config import ReportJobConfig
+from services.patient_service import PatientService
+from services.report_service import ReportInputError, ReportService
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+# Failures worth another attempt: the OpenAI API or MongoDB being briefly
+# unreachable, overloaded or slow. Anything else fails the job at once.
+TRANSIENT_ERRORS = (
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+    ConnectionFailure,  # includes AutoReconnect and server selection timeouts
+    ExecutionTimeout,
+    WTimeoutError,
+    asyncio.TimeoutError
+)
+
+
+def _is_transient(error):
+    # Services wrap driver errors in a plain Exception; look down the chain
+    while error is not None:
+        if isinstance(error, TRANSIENT_ERRORS):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class ReportJobQueue:
+    """Report generation jobs persisted in the `report_jobs` collection.
+
+    POST handlers enqueue a job and return its id; a bounded set of worker
+    tasks in every API process claims queued jobs with an atomic
+    find_one_and_update and holds a renewable lease while generating. A job
+    whose worker died is claimed again once its lease expires, so queued and
+    interrupted jobs survive restarts.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or ReportJobConfig()
+        self.collection = None
+        self.db = None
+        self._workers = []
+        self._wakeup = None
+        self._worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self.claimed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+
+    async def attach(self, db):
+        self.db = db
+        self.collection = db.report_jobs
+        await self.collection.create_index('expires_at', expireAfterSeconds=0)
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._worker(f"{self._worker_prefix}:{index}"))
+            for index in range(max(0, self.config.workers))
+        ]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def enqueue(self, patient_id: str, force: bool = False) -> dict:
+        now = datetime.utcnow()
+        job = {
+            '_id': str(uuid.uuid4()),
+            'patient_id': patient_id,
+            'force': force,
+            'status': QUEUED,
+            'stage': None,
+            'attempts': 0,
+            'error': None,
+            'report_id': None,
+            'reused': None,
+            'created_at': now,
+            'updated_at': now
+        }
+        await self.collection.insert_one(job)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str):
+        return await self.collection.find_one({'_id': job_id})
+
+    async def _claim(self, worker_id):
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {'$or': [
+                {'status': QUEUED},
+                # Abandoned by a worker that stopped renewing its lease
+                {'status': RUNNING, 'lease_expires_at': {'$lt': now}}
+            ]},
+            {
+                '$set': {
+                    'status': RUNNING,
+                    'stage': 'claimed',
+                    'worker_id': worker_id,
+                    'lease_expires_at': now + timedelta(seconds=self.config.lease_seconds),
+                    'started_at': now,
+                    'updated_at': now
+                },
+                '$inc': {'attempts': 1}
+            },
+            sort=[('created_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _update(self, job, fields):
+        # Only the worker holding the current attempt may change the job
+        fields['updated_at'] = datetime.utcnow()
+        return await self.collection.update_one(
+            {'_id': job['_id'], 'worker_id': job['worker_id'], 'attempts': job['attempts']},
+            {'$set': fields}
+        )
+
+    async def _renew_lease(self, job):
+        while True:
+            await asyncio.sleep(self.config.lease_seconds / 3)
+            await self._update(job, {
+                'lease_expires_at': datetime.utcnow() + timedelta(seconds=self.config.lease_seconds)
+            })
+
+    async def _generate(self, job):
+        await self._update(job, {'stage': 'loading_patient'})
+        async with PatientService(self.db) as service:
+            if job['patient_id'] not in await service.get_existing_patient_ids([job['patient_id']]):
+                raise ReportInputError("Patient not found")
+            patient_details = await service.get_patient_details(job['patient_id'])
+            if not any(field in patient_details for field in service.patient_model.PREDICTION_FIELDS):
+                raise ReportInputError("Patient prediction data not found")
+            prediction_data = await service.get_prediction(job['patient_id'])
+
+        await self._update(job, {'stage': 'generating'})
+        report, reused = await ReportService(self.db).generate(
+            job['patient_id'], prediction_data, patient_details, job.get('force', False)
+        )
+        return report, reused
+
+    def _finished(self, fields):
+        fields['finished_at'] = datetime.utcnow()
+        fields['expires_at'] = fields['finished_at'] + timedelta(seconds=self.config.retention_seconds)
+        fields['lease_expires_at'] = None
+        return fields
+
+    async def _run(self, job):
+        if job['attempts'] > self.config.max_attempts:
+            # Reclaimed after its workers kept dying mid-generation
+            await self._update(job, self._finished({
+                'status': FAILED, 'stage': None, 'error': 'Report job abandoned too many times'
+            }))
+            self.failed += 1
+            return
+
+        renewer = asyncio.create_task(self._renew_lease(job))
+        try:
+            report, reused = await self._generate(job)
+            await self._update(job, self._finished({
+                'status': SUCCEEDED,
+                'stage': None,
+                'report_id': report['report_id'],
+                'reused': reused,
+                'error': None
+            }))
+            self.succeeded += 1
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back, uncounted, instead of waiting for the lease
+            await self.collection.update_one(
+                {'_id': job['_id'], 'worker_id': job['worker_id'], 'attempts': job['attempts']},
+                {
+                    '$set': {'status': QUEUED, 'stage': None, 'lease_expires_at': None,
+                             'updated_at': datetime.utcnow()},
+                    '$inc': {'attempts': -1}
+                }
+            )
+            raise
+        except Exception as e:
+            if not _is_transient(e) or job['attempts'] >= self.config.max_attempts:
+                await self._update(job, self._finished({'status': FAILED, 'stage': None, 'error': str(e)}))
+                self.failed += 1
+            else:
+                await self._update(job, {
+                    'status': QUEUED, 'stage': None, 'lease_expires_at': None, 'error': str(e)
+                })
+                self.retried += 1
+        finally:
+            renewer.cancel()
+
+    async def _worker(self, worker_id):
+        while True:
+            self._wakeup.clear()
+            try:
+                job = await self._claim(worker_id)
+                if job is not None:
+                    self.claimed += 1
+                    await self._run(job)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Report job worker {worker_id} error: {str(e)}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.config.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self):
+        return {
+            'workers': len(self._workers),
+            'claimed': self.claimed,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'retried': self.retried
+        }
+
+
+report_job_queue = ReportJobQueue()
@@ -0,0 +1,157 @@
+import asyncio
+import uuid
+from datetime import datetime
+from pydantic import ValidationError
+from models.report_model import Report, ReportModel
+from services.openai_service import OpenAIService, SECTION_FIELDS
+from services.single_flight import SingleFlight
+
+# Generations in flight in this worker, keyed by input fingerprint
+report_flights = SingleFlight()
+
+
+class ReportInputError(ValueError):
+    """The patient's data cannot make a valid report; generating again will not help."""
+
+
+class ReportService:
+    """Generates and stores patient reports, reusing earlier work.
+
+    A report whose inputs (prediction and patient details) are unchanged is
+    returned from the reports collection instead of being generated again,
+    and concurrent requests with the same inputs share one generation.
+    """
+
+    def __init__(self, db=None, openai_service=None, flights=None):
+        self.report_model = ReportModel(db)
+        self._openai_service = openai_service
+        self.flights = flights or report_flights
+
+    @property
+    def openai_service(self):
+        # Created on first use so reused reports never build an OpenAI client
+        if self._openai_service is None:
+            self._openai_service = OpenAIService()
+        return self._openai_service
+
+    def build_report(self, patient_id: str, prediction_data: dict, patient_details: dict,
+                     report_content: dict, fingerprint: str = None, generation: dict = None) -> Report:
+        # Create report object with all patient details
+        return Report(
+            report_id=str(uuid.uuid4()),
+            patient_id=patient_id,
+            patient_name=patient_details['patient_name'],
+            date_of_birth=patient_details['date_of_birth'],
+            gender=patient_details['gender'],
+            vision_problems=patient_details.get('vision_problems'),
+            visual_acuity_right=patient_details['visual_acuity_right'],
+            visual_acuity_left=patient_details['visual_acuity_left'],
+            blood_sugar_fasting=patient_details.get('blood_sugar_fasting'),
+            blood_pressure=patient_details.get('blood_pressure'),
+            dr_status=prediction_data.get('dr_detection_result', 'Unknown'),
+            severity_level=prediction_data.get('severity_level', 'Unknown'),
+            confidence=prediction_data.get('prediction_confidence', 0.0),
+            patient_medical_assessment=report_content['patient_medical_assessment'],
+            dr_status_analysis=report_content['dr_status_analysis'],
+            classification_details=report_content['classification_details'],
+            vulnerable_areas_analysis=report_content['vulnerable_areas_analysis'],
+            risk_assessment=report_content['risk_assessment'],
+            recommendations=report_content['recommendations'],
+            follow_up_plan=report_content['follow_up_plan'],
+            image_url=patient_details.get('image_url'),
+            input_fingerprint=fingerprint,
+            generation=generation,
+            created_at=datetime.utcnow()
+        )
+
+    def check_inputs(self, patient_id: str, prediction_data: dict, patient_details: dict):
+        # Validate the patient fields before a completion is paid for
+        try:
+            self.build_report(patient_id, prediction_data, patient_details, dict.fromkeys(SECTION_FIELDS, ""))
+        except KeyError as e:
+            raise ReportInputError(f"Patient details are missing {str(e)}")
+        except ValidationError as e:
+            raise ReportInputError(f"Patient details cannot make a report: {str(e)}")
+
+    async def save(self, report_data: Report) -> dict:
+        await self.report_model.create(report_data)
+        return report_data.dict()
+
+    def fingerprint(self, prediction_data: dict, patient_details: dict) -> str:
+        return self.openai_service.fingerprint(prediction_data, patient_details)
+
+    async def find_reusable(self, fingerprint: str):
+        return await self.report_model.find_by_fingerprint(fingerprint)
+
+    async def generate(self, patient_id: str, prediction_data: dict, patient_details: dict,
+                       force: bool = False):
+        """
+        Return (report, reused). `force` skips reuse of a stored report but
+        still joins a generation already in flight for the same inputs.
+        """
+        fingerprint = self.fingerprint(prediction_data, patient_details)
+
+        if not force:
+            existing = await self.find_reusable(fingerprint)
+            if existing is not None:
+                return existing, True
+
+        if not self.flights.in_flight(fingerprint):
+            self.check_inputs(patient_id, prediction_data, patient_details)
+
+        async def run():
+            report_content, usage = await self.openai_service.generate_report(prediction_data, patient_details)
+            report_data = self.build_report(
+                patient_id, prediction_data, patient_details, report_content, fingerprint, usage
+            )
+            return await self.save(report_data)
+
+        return await self.flights.do(fingerprint, run), False
+
+    async def stream(self, patient_id: str, prediction_data: dict, patient_details: dict,
+                     force: bool = False):
+        """
+        Async-iterate (section, text) pairs as the model writes them, then
+        ('report', (report, reused)). The generation is registered like
+        generate()'s, so concurrent callers with the same inputs join it; a
+        reusable or in-flight report is yielded as whole sections.
+        """
+        fingerprint = self.fingerprint(prediction_data, patient_details)
+
+        existing = None if force else await self.find_reusable(fingerprint)
+        if existing is not None or self.flights.in_flight(fingerprint):
+            report = existing or await self.flights.do(fingerprint, None)
+            for section, text in self.sections(report):
+                yield section, text
+            yield "report", (report, existing is not None)
+            return
+
+        self.check_inputs(patient_id, prediction_data, patient_details)
+
+        # Sections reach this caller through the queue; the flight's result
+        # is the saved report, which joining callers receive whole
+        written = asyncio.Queue()
+
+        async def run():
+            try:
+                async for section, content in self.openai_service.stream_report(prediction_data, patient_details):
+                    if section == "report":
+                        report_content, usage = content
+                        report_data = self.build_report(
+                            patient_id, prediction_data, patient_details, report_content, fingerprint, usage
+                        )
+                        return await self.save(report_data)
+                    written.put_nowait((section, content))
+                raise Exception("Report stream ended without a report")
+            finally:
+                written.put_nowait(None)
+
+        flight = self.flights.start(fingerprint, run)
+        while (item := await written.get()) is not None:
+            yield item
+        # A disconnecting client stops reading; the generation still completes
+        yield "report", (await asyncio.shield(flight), False)
+
+    @staticmethod
+    def sections(report: dict):
+        return [(field, report.get(field, "")) for field in SECTION_FIELDS]
@@ -0,0 +1,46 @@
+import asyncio
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key onto one execution.
+
+    The first caller for a key starts `fn()` as a task; callers arriving while
+    it runs await the same task. A caller that is cancelled (e.g. a client
+    disconnect) stops waiting without cancelling the shared work.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def in_flight(self, key):
+        return key in self._flights
+
+    def _finish(self, key, task):
+        self._flights.pop(key, None)
+        # Mark a failure as retrieved even if every caller stopped waiting
+        if not task.cancelled():
+            task.exception()
+
+    def start(self, key, fn):
+        """Return the task running the flight for `key`, starting `fn()` if there is none."""
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        return task
+
+    async def do(self, key, fn):
+        return await asyncio.shield(self.start(key, fn))
+
+    def stats(self):
+        return {
+            'in_flight': len(self._flights),
+            'started': self.started,
+            'coalesced': self.coalesced
+        }
@@ -0,0 +1,81 @@
+import numpy as np
+import torch
+
+MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+# Widest Generator activation is 128 channels; allow for ~4 of them alive at
+# once (block input, conv output, residual) in float32
+_ACTIVATION_BYTES_PER_PIXEL = 4 * 128 * 4
+
+
+def tile_origins(length, tile, stride):
+    """Start offsets covering [0, length); the last tile is flush with the end."""
+    if length <= tile:
+        return [0]
+    origins = list(range(0, length - tile, stride))
+    origins.append(length - tile)
+    return origins
+
+
+def blend_window(height, width, overlap):
+    """Weights that ramp up linearly across the overlap, so seams cross-fade."""
+    def ramp(size):
+        if overlap <= 0:
+            return np.ones(size, dtype=np.float32)
+        steps = np.arange(size, dtype=np.float32)
+        edge = np.minimum(steps + 1, size - steps) / (overlap + 1)
+        return np.clip(edge, 0.0, 1.0)
+
+    return np.outer(ramp(height), ramp(width))
+
+
+def tiles_per_batch(tile_size, memory_budget_mb):
+    per_tile = tile_size * tile_size * _ACTIVATION_BYTES_PER_PIXEL
+    return max(1, int(memory_budget_mb * 1024 * 1024 // per_tile))
+
+
+def enhance_tiled(pixels, generator, tile_size=256, overlap=32, memory_budget_mb=512):
+    """Run the Generator over an RGB uint8 array of any size, tile by tile.
+
+    Tiles of `tile_size` overlap by `overlap` pixels and are blended with a
+    linear cross-fade. Tiles are pushed through the model in batches sized
+    so the activations stay within `memory_budget_mb`.
+    """
+    if overlap >= tile_size:
+        raise ValueError("Tile overlap must be smaller than the tile size")
+
+    height, width = pixels.shape[:2]
+    tile_h, tile_w = min(tile_size, height), min(tile_size, width)
+    stride = tile_size - overlap
+    boxes = [
+        (top, left)
+        for top in tile_origins(height, tile_h, stride)
+        for left in tile_origins(width, tile_w, stride)
+    ]
+
+    window = blend_window(tile_h, tile_w, overlap)
+    output = np.zeros((height, width, 3), dtype=np.float32)
+    weights = np.zeros((height, width), dtype=np.float32)
+    batch_size = tiles_per_batch(tile_size, memory_budget_mb)
+
+    for start in range(0, len(boxes), batch_size):
+        batch_boxes = boxes[start:start + batch_size]
+        tiles = np.stack([
+            pixels[top:top + tile_h, left:left + tile_w] for top, left in batch_boxes
+        ]).astype(np.float32) / 255.0
+        tiles = (tiles - MEAN) / STD
+
+        with torch.no_grad():
+            # NHWC tiles viewed as NCHW are already channels_last in memory
+            batch = torch.from_numpy(tiles).permute(0, 3, 1, 2)
+            enhanced = generator(batch.contiguous(memory_format=torch.channels_last))
+        enhanced = enhanced.permute(0, 2, 3, 1).cpu().numpy()
+        enhanced = np.clip(enhanced * STD + MEAN, 0.0, 1.0)
+
+        for (top, left), tile in zip(batch_boxes, enhanced):
+            output[top:top + tile_h, left:left + tile_w] += tile * window[..., None]
+            weights[top:top + tile_h, left:left + tile_w] += window
+
+    output /= weights[..., None]
+    return (output * 255.0 + 0.5).astype(np.uint8)
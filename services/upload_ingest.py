@@ -0,0 +1,108 @@
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+from config.upload_config import UploadConfig
+
+# Magic numbers of the image formats PIL can decode for us
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'II*\x00', 'tiff'),
+    (b'MM\x00*', 'tiff'),
+    (b'BM', 'bmp'),
+]
+
+
+def sniff_image_format(head: bytes):
+    for signature, image_format in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return image_format
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+class UploadRejected(Exception):
+    def __init__(self, message: str, status_code: int, retry_after: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+        # Seconds a client should wait before retrying, for 503s
+        self.retry_after = retry_after
+
+
+class IngestedImage:
+    def __init__(self, data, sha256: str, image_format: str, filename: str):
+        self.data = data
+        self.sha256 = sha256
+        self.format = image_format
+        self.filename = filename
+
+    @property
+    def size(self):
+        return len(self.data)
+
+
+class UploadIngestor:
+    """Copies a received upload into memory in chunks, enforcing the size
+    limit and hashing as it goes. The request body itself has already been
+    received (and, above 1 MB, spooled to a temporary file) by Starlette;
+    its size is bounded by the Content-Length check in app.py.
+
+    At most `max_concurrent_uploads` images are held in memory at once;
+    further requests wait for a slot, so peak memory stays bounded.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or UploadConfig()
+        self._slots = None
+        self._loop = None
+        self.accepted = 0
+        self.rejected = 0
+
+    def _get_slots(self):
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.config.max_concurrent_uploads)
+        return self._slots
+
+    def _reject(self, message, status_code):
+        self.rejected += 1
+        raise UploadRejected(message, status_code)
+
+    async def _read(self, upload):
+        max_bytes = self.config.max_upload_bytes
+        # Spooled uploads already know their size
+        if getattr(upload, 'size', None) is not None and upload.size > max_bytes:
+            self._reject(f"Image exceeds the {max_bytes} byte limit", 413)
+
+        chunk = await upload.read(self.config.chunk_bytes)
+        image_format = sniff_image_format(chunk)
+        if image_format is None:
+            self._reject("Uploaded file is not a supported image", 415)
+
+        digest = hashlib.sha256()
+        data = bytearray()
+        while chunk:
+            if len(data) + len(chunk) > max_bytes:
+                self._reject(f"Image exceeds the {max_bytes} byte limit", 413)
+            digest.update(chunk)
+            data.extend(chunk)
+            chunk = await upload.read(self.config.chunk_bytes)
+
+        self.accepted += 1
+        return IngestedImage(data, digest.hexdigest(), image_format, upload.filename)
+
+    @asynccontextmanager
+    async def ingest(self, upload):
+        """Yield the validated image; its memory slot is held until the block exits."""
+        async with self._get_slots():
+            yield await self._read(upload)
+
+    def stats(self):
+        return {
+            'max_upload_bytes': self.config.max_upload_bytes,
+            'max_concurrent_uploads': self.config.max_concurrent_uploads,
+            'accepted': self.accepted,
+            'rejected': self.rejected
+        }
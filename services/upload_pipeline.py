@@ -0,0 +1,33 @@
+import asyncio
+
+
+async def predict_and_upload(prediction_service, image_service, image, patient_id, filename=None,
+                             content_hash=None):
+    """Run the DR prediction and the image upload concurrently.
+
+    Both stages are always awaited: a threaded upload cannot be cancelled
+    once started, so when the prediction fails we wait for the upload and
+    delete the image again instead of leaving an orphan behind.
+
+    ``image`` is a file path or the raw image bytes; the same bytes are
+    decoded for the prediction and handed to the uploader.
+
+    Returns (prediction_result, image_url, public_id); the public_id is
+    unique to this upload, so callers can delete it again if saving fails.
+    """
+    filename = filename or image
+    public_id = image_service.public_id_for(filename, patient_id)
+    prediction_result, image_url = await asyncio.gather(
+        prediction_service.predict_dr_grade(image, content_hash),
+        image_service.upload_image(image, patient_id, filename, public_id),
+        return_exceptions=True
+    )
+
+    if isinstance(prediction_result, BaseException):
+        if not isinstance(image_url, BaseException):
+            await image_service.delete_image(public_id)
+        raise prediction_result
+    if isinstance(image_url, BaseException):
+        raise image_url
+
+    return prediction_result, image_url, public_id
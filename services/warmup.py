@@ -0,0 +1,124 @@
+import asyncio
+import time
+import numpy as np
+from PIL import Image
+from config.inference_config import InferenceConfig
+from instrumentation import stage_scope
+
+PENDING = 'pending'
+RUNNING = 'running'
+READY = 'ready'
+FAILED = 'failed'
+
+
+def _synthetic_image(size):
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8))
+
+
+class ModelWarmup:
+    """Loads the models and runs synthetic traffic through them before a
+    worker reports ready, so the first real request does not pay for graph
+    tracing, kernel selection and allocator growth.
+
+    Model loads run in worker threads (see ModelRegistry), so the event loop
+    keeps answering /health/live throughout. Stages timed during warmup are
+    recorded as `warmup.<stage>`, apart from real traffic. A failed warmup is
+    retried with exponential backoff; the worker stays unready meanwhile.
+    """
+
+    def __init__(self, prediction_service, config=None):
+        self.prediction_service = prediction_service
+        self.config = config or InferenceConfig()
+        self.status = PENDING if self.config.warmup_models else READY
+        self.error = None
+        self.attempts = 0
+        self.next_retry_at = None
+        self.started_at = None
+        self.duration_seconds = None
+        self.stage_seconds = {}
+
+    @property
+    def ready(self):
+        return self.status == READY
+
+    async def _stage(self, name, fn):
+        start = time.perf_counter()
+        await fn()
+        self.stage_seconds[name] = round(time.perf_counter() - start, 3)
+
+    async def _each_worker(self, fn, *args):
+        # Process-pool workers each hold their own models; give every worker a task
+        service = self.prediction_service
+        copies = service.executor.max_workers if service.executor.is_process else 1
+        await asyncio.gather(*(fn(*args) for _ in range(copies)))
+
+    async def _load_models(self):
+        if not self.prediction_service.executor.is_process:
+            await self.prediction_service.model_registry.load_all()
+
+    async def _warm_generator(self):
+        service = self.prediction_service
+        # Tiled enhancement runs the same Generator on 256px tiles, so one
+        # frame warms both paths
+        frame = _synthetic_image(service.config.enhance_tile_size)
+        for _ in range(self.config.warmup_rounds):
+            await self._each_worker(service.enhance_image, frame)
+
+    async def _warm_cnn(self):
+        service = self.prediction_service
+        # Single requests and full micro-batches take different kernel paths
+        batch_sizes = sorted({1, service.config.max_batch_size})
+        for _ in range(self.config.warmup_rounds):
+            for batch_size in batch_sizes:
+                batch = np.zeros((batch_size, 224, 224, 3), dtype=np.float32)
+                await self._each_worker(service._predict_batch, batch)
+
+    async def _attempt(self):
+        self.stage_seconds = {}
+        start = time.perf_counter()
+        try:
+            with stage_scope('warmup'):
+                await self._stage('load_models', self._load_models)
+                await self._stage('generator', self._warm_generator)
+                await self._stage('cnn', self._warm_cnn)
+        finally:
+            self.duration_seconds = round(time.perf_counter() - start, 3)
+
+    async def run(self):
+        if not self.config.warmup_models:
+            return
+
+        self.started_at = time.time()
+        delay = self.config.warmup_retry_seconds
+        while True:
+            self.status = RUNNING
+            self.attempts += 1
+            self.next_retry_at = None
+            try:
+                await self._attempt()
+                break
+            except Exception as e:
+                self.status = FAILED
+                self.error = str(e)
+                self.next_retry_at = time.time() + delay
+                print(f"Model warmup failed (attempt {self.attempts}), retrying in {delay:g}s: {str(e)}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.config.warmup_max_retry_seconds)
+
+        self.status = READY
+        self.error = None
+        print(f"Model warmup finished in {self.duration_seconds:.2f}s: {self.stage_seconds}")
+
+    def stats(self):
+        return {
+            'status': self.status,
+            'enabled': self.config.warmup_models,
+            'rounds': self.config.warmup_rounds,
+            'attempts': self.attempts,
+            'next_retry_at': self.next_retry_at,
+            'started_at': self.started_at,
+            'duration_seconds': self.duration_seconds,
+            'stage_seconds': dict(self.stage_seconds),
+            'error': self.error
+        }
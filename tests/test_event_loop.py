@@ -0,0 +1,43 @@
+"""DR grade inference must not block the event loop.
+
+Runs the micro-batched PredictionService against a stand-in CNN that burns
+CPU like the real kernels, while a probe coroutine measures how late it gets
+scheduled. Uses scripts/bench_event_loop.py's model and probe.
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.inference_config import InferenceConfig
+from scripts.bench_event_loop import BusyModel, InlineExecutor, StubRegistry, run_case
+from services.prediction_service import PredictionService
+
+REQUESTS = 32
+WORK_MS = 10.0
+# A light request may wait a scheduler tick or two, never a forward pass
+MAX_PROBE_P99_MS = 50.0
+
+
+def _run(inline):
+    config = InferenceConfig()
+    config.executor_kind = 'thread'
+    service = PredictionService(model_registry=StubRegistry(BusyModel(WORK_MS)), config=config)
+    if inline:
+        service.executor = InlineExecutor()
+    try:
+        return asyncio.run(run_case(service, REQUESTS))
+    finally:
+        service.executor.shutdown()
+
+
+def test_inference_runs_off_the_event_loop():
+    result = _run(inline=False)
+    assert result['probe_p99_ms'] < MAX_PROBE_P99_MS, result
+
+
+def test_probe_detects_blocking_inference():
+    # Inline, a full micro-batch holds the loop for batch_size * WORK_MS
+    result = _run(inline=True)
+    assert result['probe_p99_ms'] >= MAX_PROBE_P99_MS, result
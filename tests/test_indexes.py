@@ -0,0 +1,44 @@
+"""Every hot-path MongoDB query must be served from an index.
+
+Runs against the server in MONGODB_URI and is skipped when it is unset. The
+indexes are built in a scratch database that is dropped afterwards, so the
+check never touches application data.
+"""
+import asyncio
+import os
+import sys
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import DatabaseConfig
+from models.indexes import ensure_indexes, explain_hot_queries, missing_indexes
+
+pytestmark = pytest.mark.skipif(not os.getenv('MONGODB_URI'), reason='MONGODB_URI is not set')
+
+
+async def _check_indexes():
+    db_config = DatabaseConfig()
+    await db_config.connect()
+    name = f"{db_config.get_database_name()}_index_check_{uuid.uuid4().hex[:8]}"
+    db = db_config.client[name]
+    try:
+        errors = await ensure_indexes(db)
+        return errors, await missing_indexes(db), await explain_hot_queries(db)
+    finally:
+        await db_config.client.drop_database(name)
+        await db_config.close()
+
+
+def test_hot_queries_use_indexes():
+    errors, missing, results = asyncio.run(_check_indexes())
+
+    assert errors == {}
+    assert missing == {}
+    scans = [
+        f"{result['collection']} {result['query']}: {' > '.join(result['stages'])}"
+        for result in results if not result['indexed']
+    ]
+    assert scans == [], 'queries planned without an index:\n' + '\n'.join(scans)